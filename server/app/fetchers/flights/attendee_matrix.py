@@ -0,0 +1,157 @@
+from fast_flights import Flight, Passengers, Result
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from concurrent.futures import Future
+import time
+
+from app.fetchers.flights.fanout import collect
+from app.fetchers.flights.flights import (
+    LegReport,
+    OneWayOption,
+    RoundTripOption,
+    SearchPairModel,
+    combine_round_trips,
+    fill_report,
+    flight_search_scheduler,
+    get_search_pairs,
+    one_way_options,
+    search_pair,
+)
+from app.fetchers.flights.locations import normalize_name
+from app.fetchers.flights.results import unique_flights
+
+
+class AttendeeOrigin(BaseModel):
+    country: str = Field(..., min_length=2, max_length=100, description="Country Name")
+    city: str = Field(..., min_length=3, max_length=100, description="City Name")
+    headcount: int = Field(default=1, ge=1, description="Attendees travelling from this city")
+
+
+class AttendeeMatrixRequest(BaseModel):
+    to_country: str = Field(..., min_length=2, max_length=100, description="Venue country name")
+    to_city: str = Field(..., min_length=3, max_length=100, description="Venue city name")
+    date: str = Field(..., description="Arrival-leg departure date (e.g., '2025-08-14')")
+    return_date: Optional[str] = Field(default=None, description="Quote round trips returning on this date")
+    origins: List[AttendeeOrigin] = Field(..., min_length=1, max_length=500)
+    max_stops: int = Field(default=0, ge=0)
+    seat: Literal["economy", "premium-economy", "business", "first"]
+    fetch_mode: Literal["common", "fallback", "force-fallback", "local", "adaptive", "history"] = "common"
+    search_mode: Literal["airport", "metro"] = Field(default="airport", description="'metro' searches metro-area codes such as NYC once instead of each of their airports")
+    max_pairs: Optional[int] = Field(default=None, ge=1, description="Airport pairs searched per origin; defaults to FLIGHT_MAX_PAIRS_PER_LEG")
+    options_per_origin: int = Field(default=3, ge=1, le=20, description="Cheapest options returned for each origin")
+    time_budget_s: Optional[float] = Field(default=None, gt=0, description="Seconds the whole matrix may spend searching")
+
+
+class AttendeeOriginResult(BaseModel):
+    country: str
+    city: str
+    headcount: int
+    options: List[OneWayOption] | List[RoundTripOption] = []
+    # Cheapest fare for one attendee, and for the whole headcount
+    cheapest: Optional[float] = None
+    subtotal: Optional[float] = None
+    error: Optional[str] = None
+
+
+class AttendeeMatrixResponse(BaseModel):
+    origins: List[AttendeeOriginResult]
+    attendees: int
+    attendees_priced: int
+    # Sum of the cheapest fare times headcount over every priced origin
+    total: float
+    # Searches saved because several origins needed the same (pair, date)
+    deduplicated_searches: int
+    report: LegReport
+
+
+SearchKey = tuple[str, str, str]  # (departure, arrival, date)
+
+
+def fetch_attendee_matrix(req: AttendeeMatrixRequest) -> AttendeeMatrixResponse:
+    """
+    Cheapest flights from many origin cities to one venue. Origins naming the same city
+    are merged, and a (pair, date) search needed by several origins runs once. Fares are
+    quoted for one adult and multiplied by each origin's headcount.
+    """
+    started = time.monotonic()
+    report = LegReport(leg=0)
+
+    groups: dict[tuple[str, str], AttendeeOriginResult] = {}
+    for origin in req.origins:
+        key = (normalize_name(origin.country), normalize_name(origin.city))
+        if key in groups:
+            groups[key].headcount += origin.headcount
+        else:
+            groups[key] = AttendeeOriginResult(country=origin.country, city=origin.city, headcount=origin.headcount)
+
+    dates = (req.date, req.return_date) if req.return_date else (req.date,)
+    metros = report.metros if req.search_mode == "metro" else None
+    # Per origin: its outbound and return searches; the venue's airports come from the airport cache after the first
+    needed: dict[tuple[str, str], tuple[List[SearchKey], List[SearchKey]]] = {}
+    requested = 0
+    for key, group in groups.items():
+        try:
+            pairs, pruned, dead = get_search_pairs(
+                group.country, group.city, req.to_country, req.to_city, req.max_pairs, dates, metros
+            )
+        except Exception as e:
+            print(f"Error resolving attendee origin {group.city}, {group.country}: {e}")
+            group.error = str(e)
+            continue
+        for listed, target in ((pruned, report.pruned), (dead, report.known_dead)):
+            target.extend(SearchPairModel(from_airport=d, to_airport=a, date=req.date) for d, a in listed)
+            if req.return_date:
+                target.extend(SearchPairModel(from_airport=a, to_airport=d, date=req.return_date) for d, a in listed)
+        outbound = [(d, a, req.date) for d, a in pairs]
+        inbound = [(a, d, req.return_date) for d, a in pairs] if req.return_date else []
+        needed[key] = (outbound, inbound)
+        requested += len(outbound) + len(inbound)
+
+    searches = dict.fromkeys(search for outbound, inbound in needed.values() for search in outbound + inbound)
+    deadline = started + req.time_budget_s if req.time_budget_s else None
+    passengers = Passengers(adults=1)
+    results: dict[SearchKey, Result] = {}
+    with flight_search_scheduler.session() as session:
+        futures: dict[Future, tuple[SearchPairModel, SearchKey]] = {
+            session.submit(search_pair, departure, arrival, date, req.seat, passengers, req.max_stops, req.fetch_mode):
+                (SearchPairModel(from_airport=departure, to_airport=arrival, date=date), (departure, arrival, date))
+            for departure, arrival, date in searches
+        }
+
+        def handle(future: Future) -> bool:
+            if isinstance(future.result(), Result):
+                results[futures[future][1]] = future.result()
+            return False
+
+        stop_reason, skipped = collect(futures, handle, deadline)
+        fill_report(report, futures, skipped, stop_reason)
+
+    for key, (outbound, inbound) in needed.items():
+        group = groups[key]
+        outbound_flights: List[Flight] = [f for search in outbound if search in results for f in results[search].flights]
+        if req.return_date:
+            return_flights = [f for search in inbound if search in results for f in results[search].flights]
+            group.options = combine_round_trips(
+                outbound_flights, return_flights, req.options_per_origin,
+                outbound_date=req.date, return_date=req.return_date,
+            )
+        else:
+            options = [
+                option for search in outbound if search in results for option in one_way_options(results[search])
+            ]
+            options.sort(key=lambda option: option.total_price)
+            group.options = unique_flights(options, lambda option: option.flight)[:req.options_per_origin]
+        if group.options:
+            group.cheapest = group.options[0].total_price
+            group.subtotal = group.cheapest * group.headcount
+
+    origins = list(groups.values())
+    report.elapsed_ms = round(1000 * (time.monotonic() - started), 1)
+    return AttendeeMatrixResponse(
+        origins=origins,
+        attendees=sum(group.headcount for group in origins),
+        attendees_priced=sum(group.headcount for group in origins if group.subtotal is not None),
+        total=sum(group.subtotal for group in origins if group.subtotal is not None),
+        deduplicated_searches=requested - len(searches),
+        report=report,
+    )
@@ -0,0 +1,83 @@
+"""
+Pair-search throughput with result pages parsed on the fetching threads versus in a
+ParsePool of 1, 2, 4, ... processes. Fetches are simulated with a fixed latency and a
+synthetic results page, so no network is needed:
+
+    python -m app.fetchers.flights.bench_parsing --pairs 96 --flights 150
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import argparse
+import os
+import time
+
+from app.fetchers.flights.parsing import ParsePool, parse_page, to_result
+
+FLIGHT_ITEM = (
+    '<li><div class="sSHqwe tPgKwe ogfYpf"><span>Airline {i}</span></div>'
+    '<span class="mv1WYe"><div>6:{m:02d} PM on Mon, Sep 1</div><div>9:{m:02d} AM on Tue, Sep 2</div></span>'
+    '<span class="bOzv6">+1</span><div class="Ak5kof"><div>7 hr {m} min</div></div>'
+    '<div class="BbR8Ec"><span class="ogfYpf">{stops}</span></div>'
+    '<div class="GsCCve"></div><div class="YMlIz FpEdX">${price}</div>'
+    '<div class="filler">{filler}</div></li>'
+)
+
+
+def synthetic_page(flights: int, filler: int = 2000) -> str:
+    """A results page shaped like Google Flights' markup, with `flights` flights split over two sections."""
+    items = [
+        FLIGHT_ITEM.format(i=i, m=i % 60, stops="Nonstop" if i % 3 else "1 stop", price=150 + 7 * i, filler="x" * filler)
+        for i in range(flights)
+    ]
+    half = flights // 2
+    # parse_response skips the last item of every section after the first
+    return (
+        '<html><body><span class="gOatQ">typical</span>'
+        f'<div jsname="IWWDBc"><ul class="Rk10dc">{"".join(items[:half])}</ul></div>'
+        f'<div jsname="YdtKid"><ul class="Rk10dc">{"".join(items[half:])}<li></li></ul></div>'
+        '</body></html>'
+    )
+
+
+def run(pairs: int, threads: int, latency: float, html: str, parse: Callable[[str], object]) -> float:
+    """Pairs completed per second with `threads` concurrent searches."""
+    def search(_: int) -> object:
+        time.sleep(latency)
+        return parse(html)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(search, range(pairs)))
+    return pairs / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=64, help="pair searches per run")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent searches, as FLIGHT_SEARCH_CONCURRENCY")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated fetch latency in seconds")
+    parser.add_argument("--flights", type=int, default=120, help="flights on the synthetic page")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    html = synthetic_page(args.flights)
+    started = time.perf_counter()
+    parse_page(html, 5)
+    print(f"page: {len(html) / 1024:.0f} KiB, {args.flights} flights, parsed in {1000 * (time.perf_counter() - started):.1f} ms")
+    print(f"{'parser':<16}{'pairs/s':>10}{'speedup':>10}")
+
+    baseline = run(args.pairs, args.threads, args.latency, html, lambda page: to_result(*parse_page(page, 5)))
+    print(f"{'threads':<16}{baseline:>10.1f}{1.0:>10.2f}")
+
+    processes = 1
+    while processes <= args.max_processes:
+        pool = ParsePool(processes)
+        pool.parse(html, 5)  # spawn the workers outside the timed run
+        throughput = run(args.pairs, args.threads, args.latency, html, lambda page: pool.parse(page, 5))
+        pool.shutdown()
+        print(f"{f'{processes} processes':<16}{throughput:>10.1f}{throughput / baseline:>10.2f}")
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+from pydantic import BaseModel
+import pickle
+import sqlite3
+import threading
+import time
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: Optional[int]
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being stored.
+
+    Evictions count entries dropped to stay under `maxsize` as well as expired entries
+    found on lookup.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            stored_at, value = entry  # type: ignore[misc]
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V, age: float = 0.0) -> None:
+        """Store `value`; `age` backdates the entry when it was already `age` seconds old."""
+        with self._lock:
+            self._data[key] = (time.monotonic() - age, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        value = self.get(key, _MISSING)  # type: ignore[arg-type]
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value  # type: ignore[return-value]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return CacheStats(
+                size=len(self._data),
+                maxsize=self.maxsize,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=round(self.hits / lookups, 4) if lookups else 0.0,
+            )
+
+
+class SqliteCache:
+    """
+    Disk-backed cache tier: pickled values in a single sqlite table, expiring after `ttl`
+    seconds. Keys are stored by their repr, so they must have a stable one (tuples of
+    str/int do). Expired rows are purged every `purge_every` writes.
+    """
+
+    def __init__(self, path: str | Path, ttl: float, purge_every: int = 256):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored_at REAL, value BLOB)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[tuple[float, Any]]:
+        """Return (age in seconds, value) for a fresh entry, else None."""
+        with self._lock:
+            row = self._conn.execute("SELECT stored_at, value FROM cache WHERE key = ?", (repr(key),)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            age = time.time() - row[0]
+
+        try:
+            return age, pickle.loads(row[1])
+        except Exception:
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        blob = pickle.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, stored_at, value) VALUES (?, ?, ?)",
+                (repr(key), time.time(), blob),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                purged = self._conn.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.ttl,))
+                self.evictions += purged.rowcount
+            self._conn.commit()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return CacheStats(
+                size=size,
+                maxsize=None,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=round(self.hits / lookups, 4) if lookups else 0.0,
+            )
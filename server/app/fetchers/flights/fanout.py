@@ -0,0 +1,64 @@
+from concurrent.futures import Future, as_completed
+from typing import Callable, Iterable, Literal, Optional
+import time
+
+StopReason = Literal["deadline", "enough_results"]
+
+
+class StopRule:
+    """
+    "Enough results" rule for a fan-out: satisfied once `min_options` options have been
+    found, or once the cheapest price has stayed the same across `stable_after`
+    consecutive completed searches. With neither set it is never satisfied.
+    """
+
+    def __init__(self, min_options: Optional[int] = None, stable_after: Optional[int] = None):
+        self.min_options = min_options
+        self.stable_after = stable_after
+        self._cheapest: Optional[float] = None
+        self._stable_for = 0
+
+    def update(self, count: int, cheapest: Optional[float]) -> bool:
+        """Record one completed search. Returns True once the rule is satisfied."""
+        if cheapest is not None and cheapest == self._cheapest:
+            self._stable_for += 1
+        else:
+            self._stable_for = 0
+        self._cheapest = cheapest
+
+        if self.min_options is not None and count >= self.min_options:
+            return True
+        return self.stable_after is not None and cheapest is not None and self._stable_for >= self.stable_after
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline, never negative; None means no deadline."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def collect(
+    futures: Iterable[Future],
+    handle: Callable[[Future], bool],
+    deadline: Optional[float] = None,
+) -> tuple[Optional[StopReason], list[Future]]:
+    """
+    Pass futures to `handle` as they complete until all are done, `handle` returns True, or
+    the time.monotonic() `deadline` passes. Futures not handled by then are cancelled
+    (queued ones never start, running ones are abandoned) and returned as skipped.
+    """
+    futures = list(futures)
+    handled: set[Future] = set()
+    reason: Optional[StopReason] = None
+    try:
+        for future in as_completed(futures, timeout=remaining(deadline)):
+            handled.add(future)
+            if handle(future):
+                reason = "enough_results"
+                break
+    except TimeoutError:
+        reason = "deadline"
+
+    skipped = [future for future in futures if future not in handled]
+    for future in skipped:
+        future.cancel()
+    return (reason if skipped else None), skipped
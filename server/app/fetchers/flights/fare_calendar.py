@@ -0,0 +1,165 @@
+from fast_flights import Passengers, Result
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from concurrent.futures import Future
+import datetime as dt
+import time
+
+from app.fetchers.flights.fanout import collect
+from app.fetchers.flights.flights import (
+    LegReport,
+    PassengerModel,
+    SearchPairModel,
+    fill_report,
+    flight_search_scheduler,
+    get_search_pairs,
+    search_pair,
+)
+from app.fetchers.flights.pairing import parse_price
+
+
+class FareCalendarRequest(BaseModel):
+    date: str = Field(..., description="Centre of the date window (e.g., '2025-08-14')")
+    days_before: int = Field(default=3, ge=0, le=30, description="Days searched before `date`")
+    days_after: int = Field(default=3, ge=0, le=30, description="Days searched after `date`")
+    stay_days: Optional[int] = Field(default=None, ge=0, le=60, description="Price a round trip returning this many days after each departure")
+    from_country: str = Field(..., min_length=2, max_length=100, description="Country Name")
+    to_country: str = Field(..., min_length=2, max_length=100, description="Country Name")
+    from_city: str = Field(..., min_length=3, max_length=100, description="City Name")
+    to_city: str = Field(..., min_length=3, max_length=100, description="City Name")
+    max_stops: int = Field(default=0, ge=0)
+    seat: Literal["economy", "premium-economy", "business", "first"]
+    passengers: PassengerModel
+    fetch_mode: Literal["common", "fallback", "force-fallback", "local", "adaptive", "history"] = "common"
+    search_mode: Literal["airport", "metro"] = Field(default="airport", description="'metro' searches metro-area codes such as NYC once instead of each of their airports")
+    max_pairs: Optional[int] = Field(default=None, ge=1, description="Airport pairs searched per day; defaults to FLIGHT_MAX_PAIRS_PER_LEG")
+    time_budget_s: Optional[float] = Field(default=None, gt=0, description="Seconds the whole calendar may spend searching")
+
+
+class FareCalendarDay(BaseModel):
+    date: str
+    return_date: Optional[str] = None
+    # Cheapest one-way fare, or cheapest outbound plus cheapest return for round trips
+    min_price: Optional[float] = None
+    from_airport: Optional[str] = None
+    to_airport: Optional[str] = None
+    # Priced outbound fares found for the day
+    options: int = 0
+    # False when some of the day's searches were cut off by the time budget
+    complete: bool = True
+
+
+class FareCalendarResponse(BaseModel):
+    days: List[FareCalendarDay]
+    report: LegReport
+
+
+SearchKey = tuple[str, str, str]  # (departure, arrival, date)
+
+
+def fetch_fare_calendar(req: FareCalendarRequest) -> FareCalendarResponse:
+    """
+    Cheapest fare for every day of a date window. Airports are resolved once and all
+    (pair, date) searches share one scheduler session and the search caches.
+    """
+    report = LegReport(leg=0)
+    started = time.monotonic()
+    try:
+        days = _search_calendar(req, report)
+    except Exception as e:
+        print(f"Error building fare calendar {req}: {e}")
+        report.error = str(e)
+        days = []
+    report.elapsed_ms = round(1000 * (time.monotonic() - started), 1)
+    return FareCalendarResponse(days=days, report=report)
+
+
+def _search_calendar(req: FareCalendarRequest, report: LegReport) -> List[FareCalendarDay]:
+    centre = dt.date.fromisoformat(req.date)
+    # Past days can't be booked, and their empty searches would mark live routes dead in the route index
+    today = dt.date.today()
+    departures = [
+        day for offset in range(-req.days_before, req.days_after + 1)
+        if (day := centre + dt.timedelta(days=offset)) >= today
+    ]
+    if not departures:
+        raise ValueError("The date window is entirely in the past")
+    returns = {
+        day.isoformat(): (day + dt.timedelta(days=req.stay_days)).isoformat() if req.stay_days is not None else None
+        for day in departures
+    }
+    passengers = Passengers(
+        adults=req.passengers.adults,
+        children=req.passengers.children,
+        infants_in_seat=req.passengers.infants_in_seat,
+        infants_on_lap=req.passengers.infants_on_lap,
+    )
+
+    # Pairs are chosen per day: the route index knows routes without service by weekday
+    day_pairs: dict[str, List[tuple[str, str]]] = {}
+    searches: dict[SearchKey, None] = {}  # every (pair, date) search the calendar needs, each once
+    for date, return_date in returns.items():
+        pairs, pruned, dead = get_search_pairs(
+            req.from_country, req.from_city, req.to_country, req.to_city, req.max_pairs,
+            (date, return_date) if return_date is not None else (date,),
+            report.metros if req.search_mode == "metro" else None,
+        )
+        day_pairs[date] = pairs
+        # Return legs fly the pairs reversed
+        for departure, arrival in pairs:
+            searches[(departure, arrival, date)] = None
+            if return_date is not None:
+                searches[(arrival, departure, return_date)] = None
+        for listed, target in ((pruned, report.pruned), (dead, report.known_dead)):
+            target.extend(SearchPairModel(from_airport=d, to_airport=a, date=date) for d, a in listed)
+
+    deadline = time.monotonic() + req.time_budget_s if req.time_budget_s else None
+    cheapest: dict[SearchKey, tuple[float, int]] = {}  # search -> (cheapest price, priced options)
+    with flight_search_scheduler.session() as session:
+        futures: dict[Future, tuple[SearchPairModel, SearchKey]] = {
+            session.submit(search_pair, departure, arrival, date, req.seat, passengers, req.max_stops, req.fetch_mode):
+                (SearchPairModel(from_airport=departure, to_airport=arrival, date=date), (departure, arrival, date))
+            for departure, arrival, date in searches
+        }
+
+        def handle(future: Future) -> bool:
+            result = future.result()
+            if isinstance(result, Result):
+                prices = [price for f in result.flights if (price := parse_price(f.price)) is not None]
+                if prices:
+                    cheapest[futures[future][1]] = (min(prices), len(prices))
+            return False
+
+        stop_reason, skipped = collect(futures, handle, deadline)
+        fill_report(report, futures, skipped, stop_reason)
+
+    unfinished = {futures[future][1] for future in skipped}
+    days = []
+    for date, return_date in returns.items():
+        day = FareCalendarDay(date=date, return_date=return_date)
+        pairs = day_pairs[date]
+        outbound = _cheapest_search([(d, a, date) for d, a in pairs], cheapest)
+        inbound = _cheapest_search([(a, d, return_date) for d, a in pairs], cheapest) if return_date else None
+        day.complete = not any(
+            key in unfinished
+            for d, a in pairs
+            for key in [(d, a, date)] + ([(a, d, return_date)] if return_date else [])
+        )
+        if outbound is not None and (return_date is None or inbound is not None):
+            (price, options), (departure, arrival, _) = outbound
+            day.min_price = price + (inbound[0][0] if inbound else 0.0)
+            day.from_airport, day.to_airport = departure, arrival
+            day.options = options
+        days.append(day)
+    return days
+
+
+def _cheapest_search(
+    keys: List[SearchKey], cheapest: dict[SearchKey, tuple[float, int]]
+) -> Optional[tuple[tuple[float, int], SearchKey]]:
+    """The cheapest (price, options) among `keys` with the search it came from, summing options over all of them."""
+    found = [(cheapest[key], key) for key in keys if key in cheapest]
+    if not found:
+        return None
+    (price, _), key = min(found, key=lambda item: item[0][0])
+    return (price, sum(options for (_, options), _ in found)), key
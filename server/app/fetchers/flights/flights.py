@@ -1,11 +1,27 @@
 from fast_flights import Flight, FlightData, Passengers, Result, get_flights, create_filter, get_flights_from_filter
-from typing import List, Literal, Optional
+from fast_flights.filter import TFSData
+from typing import Any, Callable, Iterator, List, Literal, Optional, Sequence
 from pathlib import Path
-from pydantic import BaseModel, ConfigDict, Field
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from rapidfuzz import process
-import pandas as pd
-import math
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import os
+import queue
+import threading
+import time
+
+from app.fetchers.flights.cache import CacheStats, SqliteCache, TTLCache
+from app.fetchers.flights.parsing import ParsePool
+from app.fetchers.flights.results import decode_cursor, encode_cursor, project, request_digest, unique_flights
+from app.fetchers.flights.history import PriceHistory, PriceHistoryStats
+from app.fetchers.flights.hedging import FetchModeStats, HedgePool, LatencyTracker, hedged, timed
+from app.fetchers.flights.fanout import StopReason, StopRule, collect
+from app.fetchers.flights.routes import RouteAvailabilityIndex, RouteIndexStats
+from app.fetchers.flights.ranking import RankedAirport, collapse_metros, rank_airports, rank_pairs
+from app.fetchers.flights.pairing import k_smallest_pairs, parse_clock, parse_price
+from app.fetchers.flights.locations import CityMatch, normalize_name
+from app.fetchers.flights.reference import ReferenceData, load_reference
+from app.fetchers.flights.scheduler import SchedulerStats, SearchScheduler, SearchSession
 
 # --- Models ---
 
@@ -27,7 +43,12 @@ class OneWayFlight(BaseModel):
     max_stops: int = Field(default=0, ge=0)
     seat: Literal["economy", "premium-economy", "business", "first"]
     passengers: PassengerModel
-    fetch_mode: Literal["common", "fallback", "force-fallback", "local"] = "common"
+    fetch_mode: Literal["common", "fallback", "force-fallback", "local", "adaptive", "history"] = "common"
+    search_mode: Literal["airport", "metro"] = Field(default="airport", description="'metro' searches metro-area codes such as NYC once instead of each of their airports")
+    time_budget_s: Optional[float] = Field(default=None, gt=0, description="Seconds this leg may spend searching")
+    min_options: Optional[int] = Field(default=None, ge=1, description="Stop searching once this many options are found")
+    stable_after: Optional[int] = Field(default=None, ge=1, description="Stop searching once the cheapest price is unchanged across this many completed searches")
+    max_pairs: Optional[int] = Field(default=None, ge=1, description="Airport pairs searched for this leg; defaults to FLIGHT_MAX_PAIRS_PER_LEG")
 
 class RoundTripFlight(BaseModel):
     kind: Literal["round-trip"] = "round-trip"
@@ -40,8 +61,15 @@ class RoundTripFlight(BaseModel):
     max_stops: int = Field(default=0, ge=0)
     seat: Literal["economy", "premium-economy", "business", "first"]
     passengers: PassengerModel
-    fetch_mode: Literal["common", "fallback", "force-fallback", "local"] = "common"
+    fetch_mode: Literal["common", "fallback", "force-fallback", "local", "adaptive", "history"] = "common"
+    search_mode: Literal["airport", "metro"] = Field(default="airport", description="'metro' searches metro-area codes such as NYC once instead of each of their airports")
     max_combinations: int = Field(default=20, ge=1, description="Maximum round-trip combinations to generate")
+    same_airport_return: bool = Field(default=False, description="Return must leave from the outbound arrival airport and land at its departure airport")
+    min_stay_hours: Optional[float] = Field(default=None, ge=0, description="Minimum hours between outbound arrival and return departure")
+    time_budget_s: Optional[float] = Field(default=None, gt=0, description="Seconds this leg may spend searching")
+    min_options: Optional[int] = Field(default=None, ge=1, description="Stop searching once both directions have this many options")
+    stable_after: Optional[int] = Field(default=None, ge=1, description="Stop searching once the cheapest total is unchanged across this many completed searches")
+    max_pairs: Optional[int] = Field(default=None, ge=1, description="Airport pairs searched per direction; defaults to FLIGHT_MAX_PAIRS_PER_LEG")
 
 class RoundTripOption(BaseModel):
     outbound_flight: Flight
@@ -62,96 +90,408 @@ class OneWayOption(BaseModel):
 
 class FlightRequest(BaseModel):
     flights: List[OneWayFlight | RoundTripFlight]
+    time_budget_s: Optional[float] = Field(default=None, gt=0, description="Seconds the whole request may spend searching")
+    limit: Optional[int] = Field(default=None, ge=1, le=500, description="Options returned per leg; all of them when unset")
+    cursor: Optional[str] = Field(
+        default=None,
+        description="next_cursor of a previous response to the same flights and limit, to get the following page."
+        " Pages come from that search's ranked options while they are cached (FLIGHT_SEARCH_CACHE_TTL);"
+        " after that the search runs again and later pages may shift",
+    )
+    fields: Optional[List[str]] = Field(default=None, description="Dotted option fields to return, e.g. ['total_price', 'flight.price']")
+
+    def search_digest(self) -> str:
+        """Hash of what decides the ranked options and their pages: the legs (with passengers and seat) and the limit."""
+        return request_digest(self.model_dump(mode="json", include={"flights", "limit"}))
+
+    @model_validator(mode="after")
+    def check_cursor(self) -> "FlightRequest":
+        _, digest = decode_cursor(self.cursor)
+        if digest is not None and digest != self.search_digest():
+            raise ValueError("Cursor belongs to a different search")
+        return self
+
+
+class SearchPairModel(BaseModel):
+    from_airport: str
+    to_airport: str
+    date: str
+
+
+class LegReport(BaseModel):
+    leg: int
+    pairs_searched: int = 0
+    pairs_completed: int = 0
+    skipped: List[SearchPairModel] = []
+    pruned: List[SearchPairModel] = []
+    known_dead: List[SearchPairModel] = []
+    # Metro-area codes searched in place of airports, with the airports each stands for
+    metros: dict[str, List[str]] = {}
+    # Options found for the leg, before paging
+    total_options: int = 0
+    stop_reason: Optional[StopReason] = None
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class FlightResponse(BaseModel):
+    # One entry per one-way option, or one list per round-trip leg, as before; dicts when `fields` is given
+    results: list[OneWayOption | List[RoundTripOption] | List[Result] | dict[str, Any] | List[dict[str, Any]]]
+    legs: List[LegReport]
+    # Set while any leg has options past this page
+    next_cursor: Optional[str] = None
+
+
+class FlightStatsModel(BaseModel):
+    airport_codes_cache: CacheStats
+    flight_search_cache: CacheStats
+    flight_search_disk_cache: Optional[CacheStats] = None
+    ranked_results_cache: CacheStats
+    search_scheduler: SchedulerStats
+    route_index: RouteIndexStats
+    fetch_modes: List[FetchModeStats]
+    price_history: PriceHistoryStats
+
+# --- Configuration ---
+
+# Radius (miles) around the city centre searched for airports on every leg
+AIRPORT_SEARCH_RADIUS = 20
+
+AIRPORT_CODES_CACHE_SIZE = int(os.getenv("AIRPORT_CODES_CACHE_SIZE", "1024"))
+AIRPORT_CODES_CACHE_TTL = float(os.getenv("AIRPORT_CODES_CACHE_TTL", "86400"))
+
+# Freshness window (seconds) for upstream flight search results
+FLIGHT_SEARCH_CACHE_TTL = float(os.getenv("FLIGHT_SEARCH_CACHE_TTL", "900"))
+FLIGHT_SEARCH_CACHE_SIZE = int(os.getenv("FLIGHT_SEARCH_CACHE_SIZE", "4096"))
+# Optional sqlite file so cached searches survive restarts; unset keeps the cache in memory only
+FLIGHT_SEARCH_CACHE_PATH = os.getenv("FLIGHT_SEARCH_CACHE_PATH")
+# Paged searches whose ranked options are kept for their cursors, for FLIGHT_SEARCH_CACHE_TTL
+FLIGHT_RANKED_CACHE_SIZE = int(os.getenv("FLIGHT_RANKED_CACHE_SIZE", "256"))
+
+# Best-ranked airport pairs searched per leg (and per direction of a round trip); 0 searches every pair
+FLIGHT_MAX_PAIRS_PER_LEG = int(os.getenv("FLIGHT_MAX_PAIRS_PER_LEG", "6"))
+
+# Airport pairs that keep returning no flights are deprioritized at fan-out for a while.
+# Set FLIGHT_ROUTE_INDEX_PATH empty to keep the index in memory only.
+FLIGHT_ROUTE_INDEX_PATH = os.getenv("FLIGHT_ROUTE_INDEX_PATH", ".data/route_index.sqlite")
+FLIGHT_ROUTE_DEAD_AFTER = int(os.getenv("FLIGHT_ROUTE_DEAD_AFTER", "2"))
+FLIGHT_ROUTE_DECAY_DAYS = float(os.getenv("FLIGHT_ROUTE_DECAY_DAYS", "14"))
+
+# fetch_mode="adaptive" starts with "common" and also starts FLIGHT_HEDGE_BACKUP_MODE once
+# "common" has taken longer than this percentile of its recent successful fetches.
+# FLIGHT_HEDGE_DELAY_S is used until FLIGHT_HEDGE_MIN_SAMPLES fetches have succeeded.
+FLIGHT_HEDGE_PERCENTILE = float(os.getenv("FLIGHT_HEDGE_PERCENTILE", "0.9"))
+FLIGHT_HEDGE_DELAY_S = float(os.getenv("FLIGHT_HEDGE_DELAY_S", "4"))
+FLIGHT_HEDGE_MIN_SAMPLES = int(os.getenv("FLIGHT_HEDGE_MIN_SAMPLES", "20"))
+FLIGHT_HEDGE_BACKUP_MODE = os.getenv("FLIGHT_HEDGE_BACKUP_MODE", "force-fallback")
+
+# Fares seen upstream are kept here (empty keeps them in memory only). fetch_mode="history"
+# answers from it when a route has FLIGHT_HISTORY_MIN_SAMPLES fares, preferring fares seen
+# within FLIGHT_HISTORY_LEAD_TIME_DAYS of the same days-to-departure; FLIGHT_HISTORY_FALLBACK
+# also answers a fetch_mode="history" search from it when the live search it fell back to fails.
+# Other fetch modes never get estimates.
+FLIGHT_PRICE_HISTORY_PATH = os.getenv("FLIGHT_PRICE_HISTORY_PATH", ".data/price_history.sqlite")
+FLIGHT_HISTORY_MIN_SAMPLES = int(os.getenv("FLIGHT_HISTORY_MIN_SAMPLES", "5"))
+FLIGHT_HISTORY_LEAD_TIME_DAYS = int(os.getenv("FLIGHT_HISTORY_LEAD_TIME_DAYS", "14"))
+FLIGHT_HISTORY_FALLBACK = os.getenv("FLIGHT_HISTORY_FALLBACK", "1") == "1"
+# Fares older than this many days are dropped from the history; 0 keeps every fare
+FLIGHT_HISTORY_MAX_AGE_DAYS = float(os.getenv("FLIGHT_HISTORY_MAX_AGE_DAYS", "180"))
+
+# Worker processes that parse search result pages while fetches stay on threads; 0 parses in the fetching thread
+FLIGHT_PARSE_PROCESSES = int(os.getenv("FLIGHT_PARSE_PROCESSES", "0"))
+
+# Upstream searches running at once across all requests, and per request
+FLIGHT_SEARCH_CONCURRENCY = int(os.getenv("FLIGHT_SEARCH_CONCURRENCY", "16"))
+FLIGHT_SEARCH_PER_REQUEST_LIMIT = int(os.getenv("FLIGHT_SEARCH_PER_REQUEST_LIMIT", "8"))
+
+# Legs of all requests resolved and collected at once; they mostly wait on the scheduler
+FLIGHT_LEG_CONCURRENCY = int(os.getenv("FLIGHT_LEG_CONCURRENCY", "32"))
+
+# Semicolon separated "country:city" pairs resolved at startup, e.g. "united states:new york;japan:tokyo"
+FLIGHTS_PREWARM_CITIES = os.getenv("FLIGHTS_PREWARM_CITIES", "")
 
 # --- Data Loading ---
 
-AIRPORTS_FILE_PATH = Path(__file__).parent / "airports.csv"
-CITIES_FILE_PATH = Path(__file__).parent / "cities.csv"
+# Airports and cities are read from the arrays compiled by reference.py, loaded on first
+# lookup; they are rebuilt from airports.csv and cities.csv when missing or out of date.
+# The arrays are used in place, so memory-mapping lets every worker process share one
+# copy of them; each worker still builds its own city name dicts (about 5 MB).
+FLIGHT_REFERENCE_PATH = os.getenv("FLIGHT_REFERENCE_PATH", ".data/reference")
+FLIGHT_REFERENCE_MMAP = os.getenv("FLIGHT_REFERENCE_MMAP", "1") == "1"
 
-airports: pd.DataFrame = pd.read_csv(AIRPORTS_FILE_PATH)
-cities: pd.DataFrame = pd.read_csv(CITIES_FILE_PATH)
+_reference: Optional[ReferenceData] = None
+_reference_lock = threading.Lock()
+
+def reference_data() -> ReferenceData:
+    global _reference
+    with _reference_lock:
+        if _reference is None:
+            _reference = load_reference(FLIGHT_REFERENCE_PATH, mmap=FLIGHT_REFERENCE_MMAP)
+        return _reference
 
 # --- Utility Functions ---
 
-def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 3958.8  # Earth radius in miles
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-def parse_point(point_str: str) -> tuple[float, float]:
-    # Example: "POINT (37.7749 -122.4194)"
-    point_str = point_str.replace("POINT (", "").replace(")", "")
-    lng_str, lat_str = point_str.split()
-    return float(lat_str), float(lng_str)
-
-def fuzzy_search(df: pd.DataFrame, column: str, query: str, limit: int = 5, threshold: int = 80) -> pd.DataFrame:
-    choices = df[column].astype(str).tolist()
-    results = process.extract(query, choices, limit=limit, score_cutoff=threshold)
-    matched_indices = [idx for _, _, idx in results]
-    return df.iloc[matched_indices]
-
-def get_city_row(cities_df: pd.DataFrame, country: str, city: str) -> pd.DataFrame:
-    country_matches = fuzzy_search(cities_df, "country", country, limit=5000)
-    city_matches = fuzzy_search(country_matches, "city", city, threshold=75)
-    if city_matches.empty:
-        raise ValueError("City not found")
-    return city_matches.iloc[0]
-
-def get_airports_in_country(airports_df: pd.DataFrame, country_id: str) -> pd.DataFrame:
-    return airports_df[airports_df["country_id"] == country_id]
-
-def get_nearby_airports(airports_df: pd.DataFrame, city_lat: float, city_lng: float, max_distance: int=50) -> pd.DataFrame:
-    nearby = []
-    for idx, row in airports_df.iterrows():
-        try:
-            airport_lat, airport_lng = parse_point(row["location"])
-            distance = haversine(city_lat, city_lng, airport_lat, airport_lng)
-            if distance <= max_distance:
-                nearby.append(row)
-        except Exception:
-            continue
-    return pd.DataFrame(nearby)
+def get_city_row(country: str, city: str) -> CityMatch:
+    return reference_data().city_resolver.resolve(country, city)
+
+def get_nearby_airports(city_lat: float, city_lng: float, max_distance: int = 50, country_id: Optional[str] = None) -> dict[str, list]:
+    """Airports within `max_distance` miles of the point, nearest first, as parallel columns including `distance`."""
+    reference = reference_data()
+    idx, distances = reference.airport_index.within(city_lat, city_lng, max_distance, country_id)
+    return {**reference.airports(idx), "distance": distances.tolist()}
+
+airport_codes_cache: TTLCache[tuple[str, str, int], tuple[RankedAirport, ...]] = TTLCache(
+    maxsize=AIRPORT_CODES_CACHE_SIZE, ttl=AIRPORT_CODES_CACHE_TTL
+)
+
+def _resolve_airports(country: str, city: str, max_distance: int) -> tuple[RankedAirport, ...]:
+    city_row = get_city_row(country, city)
+    nearby_airports = get_nearby_airports(city_row.lat, city_row.lng, max_distance, city_row.iso2)
+    return tuple(rank_airports(
+        nearby_airports["code"],
+        nearby_airports["distance"],
+        nearby_airports["service_score"],
+        max_distance,
+        nearby_airports["metro_code"],
+    ))
+
+def get_ranked_airports(country: str, city: str, max_distance: int = 50) -> List[RankedAirport]:
+    """Airports near the city, best candidates for scheduled service first."""
+    # Lookup failures raise and are never cached
+    key = (normalize_name(country), normalize_name(city), max_distance)
+    return list(airport_codes_cache.get_or_compute(key, lambda: _resolve_airports(country, city, max_distance)))
 
 def get_airport_codes(country: str, city: str, max_distance: int = 50) -> List[str]:
-    city_row = get_city_row(cities, country.lower(), city.lower())
-    country_id = city_row["iso2"]
-    city_lat = float(city_row["lat"])
-    city_lng = float(city_row["lng"])
-    possible_airports = get_airports_in_country(airports, country_id)
-    nearby_airports = get_nearby_airports(possible_airports, city_lat, city_lng, max_distance)
-    return nearby_airports["code"].tolist()
+    return [airport.code for airport in get_ranked_airports(country, city, max_distance)]
 
+def get_search_pairs(
+    from_country: str,
+    from_city: str,
+    to_country: str,
+    to_city: str,
+    max_pairs: Optional[int] = None,
+    dates: Sequence[str] = (),
+    metros: Optional[dict[str, List[str]]] = None,
+) -> tuple[List[tuple[str, str]], List[tuple[str, str]], List[tuple[str, str]]]:
+    """
+    (searched, pruned, known_dead) airport pairs for a leg, best first; pruned and
+    known_dead are the live and known-dead pairs left out of the search. `max_pairs`
+    defaults to FLIGHT_MAX_PAIRS_PER_LEG. `dates` holds the outbound date and, for round
+    trips, the return date (searched with the pair reversed); pairs known to have no
+    service on those dates are only searched when there aren't enough others.
+    When `metros` is given, airports sharing a metro-area code are searched as that code
+    and `metros` is filled with every airport such a search may return flights from.
+    """
+    max_pairs = max_pairs or FLIGHT_MAX_PAIRS_PER_LEG or None
+    origins = get_ranked_airports(from_country, from_city, AIRPORT_SEARCH_RADIUS)
+    destinations = get_ranked_airports(to_country, to_city, AIRPORT_SEARCH_RADIUS)
+    if metros is not None:
+        origins, origin_metros = collapse_metros(origins)
+        destinations, destination_metros = collapse_metros(destinations)
+        for metro in [*origin_metros, *destination_metros]:
+            metros[metro] = reference_data().metro_airports[metro]
+    ranked, _ = rank_pairs(origins, destinations, None)
+
+    def is_dead(pair: tuple[str, str]) -> bool:
+        directions = [pair, pair[::-1]]
+        return any(route_index.is_dead(d, a, date) for (d, a), date in zip(directions, dates))
+
+    dead = [pair for pair in ranked if is_dead(pair)]
+    ordered = [pair for pair in ranked if pair not in dead] + dead
+    if max_pairs is None:
+        return ordered, [], []
+    # Dead pairs that still made the cut are searched like any other and reported as neither
+    left_out = ordered[max_pairs:]
+    return ordered[:max_pairs], [pair for pair in left_out if pair not in dead], [pair for pair in left_out if pair in dead]
+
+def prewarm_airport_codes(cities_spec: str = FLIGHTS_PREWARM_CITIES) -> int:
+    """Resolve the configured frequent cities into the airport code cache. Returns how many resolved."""
+    warmed = 0
+    for entry in cities_spec.split(";"):
+        if ":" not in entry:
+            continue
+        country, city = (part.strip() for part in entry.split(":", 1))
+        try:
+            get_airport_codes(country, city, AIRPORT_SEARCH_RADIUS)
+            warmed += 1
+        except Exception as e:
+            logging.warning(f"Could not prewarm airports for {city}, {country}: {e}")
+    return warmed
+
+def get_flight_stats() -> FlightStatsModel:
+    return FlightStatsModel(
+        airport_codes_cache=airport_codes_cache.stats(),
+        flight_search_cache=search_cache.stats(),
+        flight_search_disk_cache=search_disk_cache.stats() if search_disk_cache is not None else None,
+        ranked_results_cache=ranked_cache.stats(),
+        search_scheduler=flight_search_scheduler.stats(),
+        route_index=route_index.stats(),
+        fetch_modes=fetch_latency.stats(),
+        price_history=price_history.stats(),
+    )
+
+
+search_cache: TTLCache[tuple, Result] = TTLCache(maxsize=FLIGHT_SEARCH_CACHE_SIZE, ttl=FLIGHT_SEARCH_CACHE_TTL)
+search_disk_cache: Optional[SqliteCache] = (
+    SqliteCache(FLIGHT_SEARCH_CACHE_PATH, ttl=FLIGHT_SEARCH_CACHE_TTL) if FLIGHT_SEARCH_CACHE_PATH else None
+)
+# Each leg's ranked options and report by FlightRequest.search_digest, for paging with cursors
+ranked_cache: TTLCache[str, list[tuple[list, LegReport]]] = TTLCache(maxsize=FLIGHT_RANKED_CACHE_SIZE, ttl=FLIGHT_SEARCH_CACHE_TTL)
+
+flight_search_scheduler = SearchScheduler(
+    max_concurrency=FLIGHT_SEARCH_CONCURRENCY,
+    per_session_limit=FLIGHT_SEARCH_PER_REQUEST_LIMIT,
+)
+
+route_index = RouteAvailabilityIndex(
+    FLIGHT_ROUTE_INDEX_PATH or None,
+    dead_after=FLIGHT_ROUTE_DEAD_AFTER,
+    decay_s=FLIGHT_ROUTE_DECAY_DAYS * 86400,
+)
+
+leg_executor = ThreadPoolExecutor(max_workers=FLIGHT_LEG_CONCURRENCY, thread_name_prefix="flight-leg")
+
+price_history = PriceHistory(
+    FLIGHT_PRICE_HISTORY_PATH or None,
+    lead_time_window=FLIGHT_HISTORY_LEAD_TIME_DAYS,
+    min_samples=FLIGHT_HISTORY_MIN_SAMPLES,
+    max_age_days=FLIGHT_HISTORY_MAX_AGE_DAYS or None,
+)
+
+parse_pool: Optional[ParsePool] = ParsePool(FLIGHT_PARSE_PROCESSES) if FLIGHT_PARSE_PROCESSES > 0 else None
+
+# Adaptive searches run both of their fetches here, so a search worker can wait on whichever answers first.
+# Stalled losers keep their slot until they finish; once all are taken, searches fetch unhedged.
+fetch_latency = LatencyTracker()
+hedge_pool = HedgePool(2 * FLIGHT_SEARCH_CONCURRENCY, thread_name_prefix="flight-hedge")
+
+def is_no_service(error: BaseException) -> bool:
+    """fast_flights' answer for a pair without service, as opposed to a failed fetch."""
+    return isinstance(error, RuntimeError) and "No flights found" in str(error)
+
+def hedge_delay() -> float:
+    """Seconds an adaptive search waits on "common" before starting the backup fetch mode."""
+    learned = fetch_latency.percentile("common", FLIGHT_HEDGE_PERCENTILE, FLIGHT_HEDGE_MIN_SAMPLES)
+    return FLIGHT_HEDGE_DELAY_S if learned is None else learned
+
+def search_cache_key(departure: str, arrival: str, date: str, seat: str, passengers: Passengers, max_stops: Optional[int]) -> tuple:
+    # fetch_mode only changes how the page is fetched, not what it contains, so it isn't part of the key
+    return (departure, arrival, date, seat, tuple(int(p) for p in passengers.pb), max_stops)
 
 def search_pair(departure: str, arrival: str, date: str, seat: str, passengers: Passengers, max_stops: int, fetch_mode: str) -> List | Result:
+    key = search_cache_key(departure, arrival, date, seat, passengers, max_stops)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if search_disk_cache is not None:
+        stored = search_disk_cache.get(key)
+        if stored is not None:
+            age, result = stored
+            search_cache.set(key, result, age=age)
+            return result
+
+    wants_history = fetch_mode == "history"
+    if wants_history:
+        estimated = history_result(departure, arrival, date, seat, passengers, max_stops)
+        if estimated is not None:
+            return estimated
+        fetch_mode = "common"
+
     try:
-        result = get_flights(
-            flight_data=[
-                FlightData(
-                    date=date,
-                    from_airport=departure,
-                    to_airport=arrival,
-                    max_stops=max_stops,
-                )
-            ],
+        result = _search_pair_upstream(departure, arrival, date, seat, passengers, max_stops, fetch_mode)
+    except Exception as e:
+        # fast_flights raises "No flights found" for pairs without service; other errors
+        # (HTTP failures, rate limits) say nothing about the route
+        if is_no_service(e):
+            route_index.record(departure, arrival, date, has_service=False)
+            return []
+        # Too little history answered nothing above; with the live search gone, any history beats none
+        if wants_history and FLIGHT_HISTORY_FALLBACK:
+            return history_result(departure, arrival, date, seat, passengers, max_stops, min_samples=1) or []
+        return []
+
+    route_index.record(departure, arrival, date, has_service=isinstance(result, Result) and bool(result.flights))
+    if isinstance(result, Result):
+        price_history.record(
+            departure, arrival, date, seat, len(passengers.pb), max_stops,
+            (price for f in result.flights if (price := parse_price(f.price)) is not None),
+        )
+        search_cache.set(key, result)
+        if search_disk_cache is not None:
+            search_disk_cache.set(key, result)
+    return result
+
+def _search_pair_upstream(departure: str, arrival: str, date: str, seat: str, passengers: Passengers, max_stops: int, fetch_mode: str) -> List | Result:
+    flight_data = [
+        FlightData(
+            date=date,
+            from_airport=departure,
+            to_airport=arrival,
+            max_stops=max_stops,
+        )
+    ]
+
+    def fetch(mode: str) -> List | Result:
+        if parse_pool is not None:
+            flight_filter = TFSData.from_interface(flight_data=flight_data, trip="one-way", passengers=passengers, seat=seat)
+            return parse_pool.search(flight_filter, mode, limit=5)
+        return get_flights(
+            flight_data=flight_data,
             trip="one-way",
             seat=seat,
             passengers=passengers,
-            fetch_mode=fetch_mode,
+            fetch_mode=mode,
         )
 
-        if isinstance(result, Result):
-            for f in result.flights:  # limit per pair
-                f.from_airport = departure
-                f.to_airport = arrival
-                result.flights = result.flights[:5]
-            return result
-        return []
-    except Exception:
-        return []
+    if fetch_mode == "adaptive":
+        result = hedged(fetch, "common", FLIGHT_HEDGE_BACKUP_MODE, hedge_delay(), hedge_pool, fetch_latency, is_no_service)
+    else:
+        result = timed(fetch_latency, fetch_mode, fetch, is_no_service)
+
+    if isinstance(result, Result):
+        result.flights = result.flights[:5]  # limit per pair
+        for f in result.flights:
+            f.from_airport = departure
+            f.to_airport = arrival
+        return result
+    return []
+
+def history_result(
+    departure: str,
+    arrival: str,
+    date: str,
+    seat: str,
+    passengers: Passengers,
+    max_stops: Optional[int],
+    min_samples: Optional[int] = None,
+) -> Optional[Result]:
+    """
+    A Result holding the route's 25th, 50th and 75th percentile past fares as flights,
+    named so they can't be mistaken for live ones; None without enough history.
+    Estimates are never cached, so a later live search isn't shadowed by them.
+    """
+    estimate = price_history.estimate(departure, arrival, date, seat, len(passengers.pb), max_stops, min_samples)
+    if estimate is None:
+        return None
+
+    flights = []
+    for percentile, price in (("p25", estimate.p25), ("p50", estimate.p50), ("p75", estimate.p75)):
+        flight = Flight(
+            is_best=percentile == "p50",
+            name=f"Historical {percentile} fare ({estimate.samples} observed)",
+            departure="",
+            arrival="",
+            arrival_time_ahead="",
+            duration="",
+            stops=0,
+            delay=None,
+            price=f"${price:.0f}",
+        )
+        flight.from_airport = departure
+        flight.to_airport = arrival
+        flights.append(flight)
+    return Result(current_price="typical", flights=flights)
 
 # --- Main Flight Logic ---
 
@@ -168,13 +508,39 @@ def get_complete_roundtrip_flights(
     infants_on_lap: int = 0,
     seat_class: Literal["economy", "premium-economy", "business", "first"] = "economy",
     max_stops: Optional[int] = None,
-    fetch_mode: Literal["common", "fallback", "force-fallback", "local"] = "common",
-    max_combinations: int = 20
+    fetch_mode: Literal["common", "fallback", "force-fallback", "local", "adaptive", "history"] = "common",
+    max_combinations: int = 20,
+    session: Optional[SearchSession] = None,
+    same_airport_return: bool = False,
+    min_stay_hours: Optional[float] = None,
+    on_update: Optional[Callable[[List[RoundTripOption]], None]] = None,
+    deadline: Optional[float] = None,
+    stop_rule: Optional[StopRule] = None,
+    report: Optional[LegReport] = None,
+    max_pairs: Optional[int] = None,
+    search_mode: Literal["airport", "metro"] = "airport",
 ) -> List[RoundTripOption]:
     """
     Get complete round-trip flights by making separate outbound and return requests,
     iterating over all airport pairs for both directions.
+    Searches run on `session` when given, otherwise on a session of their own.
+    `on_update` receives the best combinations so far each time a search adds flights.
+    Searching stops early at the time.monotonic() `deadline` or once `stop_rule` is
+    satisfied; `report` is filled in with what was searched, skipped and pruned.
+    Only the `max_pairs` best-ranked airport pairs are searched in each direction;
+    `search_mode="metro"` searches metro-area codes in place of their airports.
     """
+    if session is None:
+        with flight_search_scheduler.session() as own_session:
+            return get_complete_roundtrip_flights(
+                outbound_date, return_date, from_country, to_country, from_city, to_city,
+                adults, children, infants_in_seat, infants_on_lap, seat_class, max_stops,
+                fetch_mode, max_combinations, session=own_session,
+                same_airport_return=same_airport_return, min_stay_hours=min_stay_hours,
+                on_update=on_update, deadline=deadline, stop_rule=stop_rule, report=report,
+                max_pairs=max_pairs, search_mode=search_mode,
+            )
+
     passengers = Passengers(
         adults=adults,
         children=children,
@@ -182,125 +548,336 @@ def get_complete_roundtrip_flights(
         infants_on_lap=infants_on_lap
     )
 
-    # Get all possible airports for outbound and return directions
-    from_airports = get_airport_codes(from_country, from_city, 20)
-    to_airports = get_airport_codes(to_country, to_city, 20)
+    # Best-ranked outbound airport pairs; the return direction searches the same pairs reversed
+    metros: Optional[dict[str, List[str]]] = {} if search_mode == "metro" else None
+    pairs, pruned, dead = get_search_pairs(
+        from_country, from_city, to_country, to_city, max_pairs, (outbound_date, return_date), metros
+    )
+    if report is not None:
+        report.metros.update(metros or {})
+        for listed, target in ((pruned, report.pruned), (dead, report.known_dead)):
+            target.extend(SearchPairModel(from_airport=d, to_airport=a, date=outbound_date) for d, a in listed)
+            target.extend(SearchPairModel(from_airport=a, to_airport=d, date=return_date) for d, a in listed)
 
     outbound_flights = []
     return_flights = []
 
-    
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                search_pair, departure, arrival, outbound_date, seat_class, passengers, max_stops, fetch_mode
+    # Both directions are queued together; each future remembers its pair and which list it feeds
+    futures: dict[Future, tuple[SearchPairModel, List[Flight]]] = {}
+    for departure, arrival in pairs:
+        for date, origin, destination, flights in (
+            (outbound_date, departure, arrival, outbound_flights),
+            (return_date, arrival, departure, return_flights),
+        ):
+            future = session.submit(
+                search_pair, origin, destination, date, seat_class, passengers, max_stops, fetch_mode
             )
-            for departure in from_airports
-            for arrival in to_airports
-        ]
-        for future in as_completed(futures):
-            if isinstance(future.result(), Result):
-                outbound_flights.extend(future.result().flights)
-    
-    
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                search_pair, departure, arrival, return_date, seat_class, passengers, max_stops, fetch_mode
-            )
-            for departure in to_airports
-            for arrival in from_airports
-        ]
-        for future in as_completed(futures):
-            if isinstance(future.result(), Result):
-                return_flights.extend(future.result().flights)
-
-
-    # Generate round-trip combinations
-    combinations = []
-    for outbound in outbound_flights[:max_combinations]:
-        for return_flight in return_flights[:max_combinations]:
-            if len(combinations) >= max_combinations:
-                break
-            try:
-                total_price = float(outbound.price[1:]) + float(return_flight.price[1:])
-            except Exception:
-                total_price = 0.0
-            combinations.append(RoundTripOption(
-                outbound_flight=outbound,
-                return_flight=return_flight,
-                total_price=total_price,
-                outbound_flight_from_airport=outbound.from_airport,
-                outbound_flight_to_airport=outbound.to_airport,
-                return_flight_from_airport=return_flight.from_airport,
-                return_flight_to_airport=return_flight.to_airport,
-            ))
-
-    combinations.sort(key=lambda x: x.total_price)
-    return combinations[:max_combinations]
-
-def fetch_flights(req: FlightRequest) -> list[OneWayOption | List[RoundTripOption]]:
+            futures[future] = (SearchPairModel(from_airport=origin, to_airport=destination, date=date), flights)
+
+    def combine() -> List[RoundTripOption]:
+        return combine_round_trips(
+            outbound_flights, return_flights, max_combinations,
+            outbound_date=outbound_date,
+            return_date=return_date,
+            same_airport_return=same_airport_return,
+            min_stay_hours=min_stay_hours,
+        )
+
+    def handle(future: Future) -> bool:
+        if isinstance(future.result(), Result):
+            futures[future][1].extend(future.result().flights)
+            if on_update is not None and outbound_flights and return_flights:
+                on_update(combine())
+        if stop_rule is None:
+            return False
+        cheapest_out = min((p for f in outbound_flights if (p := parse_price(f.price)) is not None), default=None)
+        cheapest_ret = min((p for f in return_flights if (p := parse_price(f.price)) is not None), default=None)
+        cheapest = cheapest_out + cheapest_ret if cheapest_out is not None and cheapest_ret is not None else None
+        return stop_rule.update(min(len(outbound_flights), len(return_flights)), cheapest)
+
+    stop_reason, skipped = collect(futures, handle, deadline)
+    if report is not None:
+        fill_report(report, futures, skipped, stop_reason)
+
+    return combine()
+
+def fill_report(report: LegReport, futures: dict[Future, Any], skipped: List[Future], stop_reason: Optional[StopReason]) -> None:
+    """Add a collect() run over `futures` (each keyed to a tuple starting with its SearchPairModel) to `report`."""
+    report.pairs_searched += len(futures)
+    report.pairs_completed += len(futures) - len(skipped)
+    report.skipped.extend(futures[future][0] for future in skipped)
+    report.stop_reason = report.stop_reason or stop_reason
+
+def sort_by_price(flights: List[Flight]) -> List[tuple[float, Flight]]:
+    """(price, flight) for every flight with a usable price, cheapest first."""
+    priced = [(price, f) for f in flights if (price := parse_price(f.price)) is not None]
+    priced.sort(key=lambda item: item[0])
+    return priced
+
+def combine_round_trips(
+    outbound_flights: List[Flight],
+    return_flights: List[Flight],
+    max_combinations: int,
+    outbound_date: str,
+    return_date: str,
+    same_airport_return: bool = False,
+    min_stay_hours: Optional[float] = None,
+) -> List[RoundTripOption]:
+    """The max_combinations cheapest (outbound, return) pairs that satisfy the constraints."""
+
+    def accept(outbound: Flight, return_flight: Flight) -> bool:
+        if same_airport_return and (
+            return_flight.from_airport != outbound.to_airport or return_flight.to_airport != outbound.from_airport
+        ):
+            return False
+        if min_stay_hours is not None:
+            landed = parse_clock(outbound.arrival, outbound_date, outbound.arrival_time_ahead)
+            leaves = parse_clock(return_flight.departure, return_date)
+            # Pairs whose times can't be read are kept rather than silently dropped
+            if landed and leaves and (leaves - landed).total_seconds() < min_stay_hours * 3600:
+                return False
+        return True
+
+    def first_of_each_itinerary(flights: List[Flight]) -> List[tuple[float, Flight]]:
+        return unique_flights(sort_by_price(flights), lambda item: item[1])
+
+    pairs = k_smallest_pairs(
+        first_of_each_itinerary(outbound_flights), first_of_each_itinerary(return_flights), max_combinations, accept
+    )
+    return [
+        RoundTripOption(
+            outbound_flight=outbound,
+            return_flight=return_flight,
+            total_price=total_price,
+            outbound_flight_from_airport=outbound.from_airport,
+            outbound_flight_to_airport=outbound.to_airport,
+            return_flight_from_airport=return_flight.from_airport,
+            return_flight_to_airport=return_flight.to_airport,
+        )
+        for total_price, outbound, return_flight in pairs
+    ]
+
+def fetch_flights(req: FlightRequest) -> FlightResponse:
+    offset, _ = decode_cursor(req.cursor)
+    digest = req.search_digest()
+    ranked = ranked_cache.get(digest) if req.cursor else None
+    if ranked is None:
+        ranked = _fetch_legs(req)
+        if req.limit:
+            ranked_cache.set(digest, ranked)
+
     results = []
-    for flight in req.flights:
-        try:
-            passengers_obj = Passengers(
-                adults=flight.passengers.adults,
-                children=flight.passengers.children,
-                infants_in_seat=flight.passengers.infants_in_seat,
-                infants_on_lap=flight.passengers.infants_on_lap,
-            )
+    legs = []
+    more = False
+    for flight, (leg_result, report) in zip(req.flights, ranked):
+        report = report.model_copy()
+        if report.error is None:
+            leg_result, leg_more = _page_leg(flight, leg_result, report, offset, req.limit, req.fields)
+            more = more or leg_more
+        results.extend(leg_result)
+        legs.append(report)
+    next_cursor = encode_cursor(offset + req.limit, digest) if more and req.limit else None
+    return FlightResponse(results=results, legs=legs, next_cursor=next_cursor)
+
+def _fetch_legs(req: FlightRequest) -> list[tuple[list, LegReport]]:
+    """Every leg's ranked options and report, before paging."""
+    # Legs run concurrently but share one search session, so the request as a whole
+    # still gets a single fair share of the upstream scheduler
+    deadline = time.monotonic() + req.time_budget_s if req.time_budget_s else None
+    with flight_search_scheduler.session() as session:
+        return list(leg_executor.map(
+            lambda indexed: _fetch_leg(indexed[0], indexed[1], session, deadline), enumerate(req.flights)
+        ))
+
+def _page_leg(
+    flight: OneWayFlight | RoundTripFlight,
+    leg_result: list,
+    report: LegReport,
+    offset: int,
+    limit: Optional[int],
+    fields: Optional[List[str]],
+) -> tuple[list, bool]:
+    """One page of a leg's options, projected to `fields`, and whether more follow it."""
+    options = leg_result[0] if flight.kind == "round-trip" else leg_result
+    report.total_options = len(options)
+    end = offset + limit if limit else len(options)
+    page: list = options[offset:end]
+    if fields:
+        page = [project(option.model_dump(mode="json"), fields) for option in page]
+    return ([page] if flight.kind == "round-trip" else page), end < len(options)
+
+def _fetch_leg(
+    index: int, flight: OneWayFlight | RoundTripFlight, session: SearchSession, deadline: Optional[float]
+) -> tuple[list[OneWayOption | List[RoundTripOption]], LegReport]:
+    """Results for one leg, in the shape fetch_flights appends them. Failures stay within the leg."""
+    report = LegReport(leg=index)
+    try:
+        return _search_leg(flight, session, report, deadline=deadline), report
+    except Exception as e:
+        print(f"Error processing flight {flight}: {e}")
+        report.error = str(e)
+        if flight.kind == "one-way":
+            return [[Result(current_price="high", flights=[])]], report
+        return [[]], report
+
+def one_way_options(result: Result) -> List[OneWayOption]:
+    """One option per priced flight of a search result, in the result's order."""
+    options = []
+    for option in result.flights:
+        price = parse_price(option.price)
+        if price is None:
+            continue
+        options.append(OneWayOption(
+            flight=option,
+            total_price=price,
+            from_airport=option.from_airport,
+            to_airport=option.to_airport,
+        ))
+    return options
+
+def _search_leg(
+    flight: OneWayFlight | RoundTripFlight,
+    session: SearchSession,
+    report: LegReport,
+    on_update: Optional[Callable[[List[OneWayOption] | List[RoundTripOption]], None]] = None,
+    deadline: Optional[float] = None,
+) -> list[OneWayOption | List[RoundTripOption]]:
+    """
+    Search one leg and fill in `report`. `on_update` sees one-way options as each pair
+    search completes, or the current best round-trip combinations for round-trip legs.
+    The leg stops at the earlier of `deadline` and its own time budget.
+    """
+    started = time.monotonic()
+    if flight.time_budget_s is not None:
+        leg_deadline = started + flight.time_budget_s
+        deadline = leg_deadline if deadline is None else min(deadline, leg_deadline)
+    stop_rule = StopRule(flight.min_options, flight.stable_after) if flight.min_options or flight.stable_after else None
 
-            if flight.kind == "one-way":
-                from_airports = get_airport_codes(flight.from_country, flight.from_city, 20)
-                to_airports = get_airport_codes(flight.to_country, flight.to_city, 20)
-                flight_results = []
-
-                with ThreadPoolExecutor() as executor:
-                    futures = [
-                        executor.submit(search_pair, departure, arrival, flight.date, flight.seat, passengers_obj, flight.max_stops, flight.fetch_mode)
-                        for departure in from_airports
-                        for arrival in to_airports
-                    ]
-                    for future in as_completed(futures):
-                        if isinstance(future.result(), Result):
-                            flight_results.append(future.result())
-                
-                for flight_result in flight_results:
-                    for flight in flight_result.flights:
-                        results.append(OneWayOption(
-                            flight=flight,
-                            total_price=float(flight.price[1:]),
-                            from_airport=flight.from_airport,
-                            to_airport=flight.to_airport,
-                        ))
-
-                
-
-
-            elif flight.kind == "round-trip":
-                round_trip_options = get_complete_roundtrip_flights(
-                    outbound_date=flight.outbound_date,
-                    return_date=flight.return_date,
-                    from_country=flight.from_country,
-                    to_country=flight.to_country,
-                    from_city=flight.from_city,
-                    to_city=flight.to_city,
-                    adults=flight.passengers.adults,
-                    children=flight.passengers.children,
-                    infants_in_seat=flight.passengers.infants_in_seat,
-                    infants_on_lap=flight.passengers.infants_on_lap,
-                    seat_class=flight.seat,
-                    max_stops=flight.max_stops,
-                    fetch_mode=flight.fetch_mode,
-                    max_combinations=flight.max_combinations
-                )
-                results.append(round_trip_options)
+    try:
+        if flight.kind == "one-way":
+            return _search_one_way(flight, session, report, on_update, deadline, stop_rule)
+
+        round_trip_options = get_complete_roundtrip_flights(
+            outbound_date=flight.outbound_date,
+            return_date=flight.return_date,
+            from_country=flight.from_country,
+            to_country=flight.to_country,
+            from_city=flight.from_city,
+            to_city=flight.to_city,
+            adults=flight.passengers.adults,
+            children=flight.passengers.children,
+            infants_in_seat=flight.passengers.infants_in_seat,
+            infants_on_lap=flight.passengers.infants_on_lap,
+            seat_class=flight.seat,
+            max_stops=flight.max_stops,
+            fetch_mode=flight.fetch_mode,
+            max_combinations=flight.max_combinations,
+            session=session,
+            same_airport_return=flight.same_airport_return,
+            min_stay_hours=flight.min_stay_hours,
+            on_update=on_update,
+            deadline=deadline,
+            stop_rule=stop_rule,
+            report=report,
+            max_pairs=flight.max_pairs,
+            search_mode=flight.search_mode,
+        )
+        return [round_trip_options]
+    finally:
+        report.elapsed_ms = round(1000 * (time.monotonic() - started), 1)
+
+def _search_one_way(
+    flight: OneWayFlight,
+    session: SearchSession,
+    report: LegReport,
+    on_update: Optional[Callable[[List[OneWayOption]], None]],
+    deadline: Optional[float],
+    stop_rule: Optional[StopRule],
+) -> list[OneWayOption]:
+    passengers_obj = Passengers(
+        adults=flight.passengers.adults,
+        children=flight.passengers.children,
+        infants_in_seat=flight.passengers.infants_in_seat,
+        infants_on_lap=flight.passengers.infants_on_lap,
+    )
+    pairs, pruned, dead = get_search_pairs(
+        flight.from_country, flight.from_city, flight.to_country, flight.to_city, flight.max_pairs, (flight.date,),
+        report.metros if flight.search_mode == "metro" else None,
+    )
+    report.pruned.extend(SearchPairModel(from_airport=d, to_airport=a, date=flight.date) for d, a in pruned)
+    report.known_dead.extend(SearchPairModel(from_airport=d, to_airport=a, date=flight.date) for d, a in dead)
+    results: list[OneWayOption] = []
+
+    futures = {
+        session.submit(search_pair, departure, arrival, flight.date, flight.seat, passengers_obj, flight.max_stops, flight.fetch_mode):
+            (SearchPairModel(from_airport=departure, to_airport=arrival, date=flight.date), results)
+        for departure, arrival in pairs
+    }
+
+    def handle(future: Future) -> bool:
+        if isinstance(future.result(), Result):
+            options = one_way_options(future.result())
+            results.extend(options)
+            if on_update is not None and options:
+                on_update(options)
+        if stop_rule is None:
+            return False
+        return stop_rule.update(len(results), min((option.total_price for option in results), default=None))
+
+    stop_reason, skipped = collect(futures, handle, deadline)
+    fill_report(report, futures, skipped, stop_reason)
+    # Cheapest first, each itinerary once however many pair searches returned it
+    results.sort(key=lambda option: option.total_price)
+    return unique_flights(results, lambda option: option.flight)
+
+def stream_flights(req: FlightRequest) -> Iterator[dict[str, Any]]:
+    """
+    Search every leg concurrently and yield frames as pair searches complete:
 
+    - {"event": "options", "leg", "kind": "one-way", "options"}: new one-way options
+    - {"event": "options", "leg", "kind": "round-trip", "options"}: current best round trips, replacing earlier frames
+    - {"event": "leg_complete", "leg", "count", "cheapest", "report"}
+    - {"event": "summary", "legs", "elapsed_ms"}: always the last frame
+
+    `fields` projects the streamed options; `limit` and `cursor` only apply to fetch_flights.
+    """
+    started = time.monotonic()
+    deadline = started + req.time_budget_s if req.time_budget_s else None
+    events: queue.Queue = queue.Queue()
+
+    def run_leg(index: int, flight: OneWayFlight | RoundTripFlight) -> None:
+        def on_update(options: List[OneWayOption] | List[RoundTripOption]) -> None:
+            dumped = [option.model_dump(mode="json") for option in options]
+            events.put({
+                "event": "options",
+                "leg": index,
+                "kind": flight.kind,
+                "options": [project(option, req.fields) for option in dumped] if req.fields else dumped,
+            })
+
+        report = LegReport(leg=index)
+        frame: dict[str, Any] = {"event": "leg_complete", "leg": index, "count": 0, "cheapest": None}
+        try:
+            results = _search_leg(flight, session, report, on_update, deadline)
+            options = results[0] if flight.kind == "round-trip" else results
+            frame["count"] = len(options)
+            frame["cheapest"] = min((option.total_price for option in options), default=None)
         except Exception as e:
             print(f"Error processing flight {flight}: {e}")
-            if flight.kind == "one-way":
-                results.append([Result(current_price="high", flights=[])])
-            else:
-                results.append([])
-
-    return results
+            report.error = str(e)
+        frame["report"] = report.model_dump(mode="json")
+        events.put(frame)
+
+    with flight_search_scheduler.session() as session:
+        for index, flight in enumerate(req.flights):
+            leg_executor.submit(run_leg, index, flight)
+
+        legs = []
+        while len(legs) < len(req.flights):
+            frame = events.get()
+            if frame["event"] == "leg_complete":
+                legs.append({"leg": frame["leg"], "count": frame["count"], "cheapest": frame["cheapest"], **frame["report"]})
+            yield frame
+
+    legs.sort(key=lambda leg: leg["leg"])
+    yield {"event": "summary", "legs": legs, "elapsed_ms": round(1000 * (time.monotonic() - started), 1)}
@@ -0,0 +1,171 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+from pydantic import BaseModel
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class FetchModeStats(BaseModel):
+    mode: str
+    attempts: int
+    successes: int
+    failures: int
+    hedges_won: int
+    success_rate: float
+    p50_ms: float
+    p95_ms: float
+
+
+class LatencyTracker:
+    """
+    Latency and outcome of recent upstream fetches, per fetch mode. Only successful
+    fetches contribute latency samples; the most recent `samples` are kept per mode.
+    """
+
+    def __init__(self, samples: int = 512):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+        self._counts: dict[str, list[int]] = {}  # mode -> [attempts, successes, failures, hedges won]
+
+    def _entry(self, mode: str) -> list[int]:
+        if mode not in self._counts:
+            self._counts[mode] = [0, 0, 0, 0]
+            self._latencies[mode] = deque(maxlen=self.samples)
+        return self._counts[mode]
+
+    def record(self, mode: str, latency_s: float, ok: bool) -> None:
+        with self._lock:
+            counts = self._entry(mode)
+            counts[0] += 1
+            if ok:
+                counts[1] += 1
+                self._latencies[mode].append(latency_s)
+            else:
+                counts[2] += 1
+
+    def record_hedge_won(self, mode: str) -> None:
+        with self._lock:
+            self._entry(mode)[3] += 1
+
+    def percentile(self, mode: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """The `q` quantile (0-1) of successful latencies in seconds; None with fewer than `min_samples`."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(mode, ()))
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return latencies[int(q * (len(latencies) - 1))]
+
+    def stats(self) -> list[FetchModeStats]:
+        with self._lock:
+            entries = [(mode, list(counts), sorted(self._latencies[mode])) for mode, counts in self._counts.items()]
+        return [
+            FetchModeStats(
+                mode=mode,
+                attempts=attempts,
+                successes=successes,
+                failures=failures,
+                hedges_won=hedges_won,
+                success_rate=round(successes / attempts, 4) if attempts else 0.0,
+                p50_ms=round(1000 * latencies[int(0.5 * (len(latencies) - 1))], 2) if latencies else 0.0,
+                p95_ms=round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0.0,
+            )
+            for mode, (attempts, successes, failures, hedges_won), latencies in sorted(entries)
+        ]
+
+
+def _never(error: BaseException) -> bool:
+    return False
+
+
+def timed(
+    tracker: LatencyTracker,
+    mode: str,
+    fn: Callable[[str], T],
+    is_answer: Callable[[BaseException], bool] = _never,
+) -> T:
+    """
+    Call fn(mode) and record its latency and outcome under `mode`. Errors `is_answer`
+    accepts are definite upstream answers (e.g. no flights on the route) and count as
+    successes.
+    """
+    started = time.monotonic()
+    try:
+        result = fn(mode)
+    except Exception as e:
+        tracker.record(mode, time.monotonic() - started, ok=is_answer(e))
+        raise
+    tracker.record(mode, time.monotonic() - started, ok=True)
+    return result
+
+
+class HedgePool:
+    """
+    Threads for hedged fetches that never queue: try_submit returns None once `workers`
+    fetches are running, losers that are still stalled included, so callers fetch
+    unhedged instead of waiting behind them.
+    """
+
+    def __init__(self, workers: int, thread_name_prefix: str = ""):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def try_submit(self, fn: Callable[..., T], *args) -> Optional[Future]:
+        if not self._slots.acquire(blocking=False):
+            return None
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def hedged(
+    fn: Callable[[str], T],
+    primary: str,
+    backup: str,
+    delay: float,
+    pool: HedgePool,
+    tracker: LatencyTracker,
+    is_answer: Callable[[BaseException], bool] = _never,
+) -> T:
+    """
+    fn(primary), with fn(backup) started alongside it if the primary hasn't answered
+    within `delay` seconds or fails first. The first success wins; the loser is left to
+    finish in the background and still counts towards the tracker. Errors `is_answer`
+    accepts are raised as soon as either mode returns them, without hedging. Raises the
+    last error when both fail. Without a free slot in `pool` the fetch runs unhedged on
+    the calling thread, or the backup isn't started.
+    """
+    first = pool.try_submit(timed, tracker, primary, fn, is_answer)
+    if first is None:
+        return timed(tracker, primary, fn, is_answer)
+
+    pending: dict[Future, str] = {first: primary}
+    done, _ = wait(pending, timeout=delay)
+    if done:
+        if first.exception() is None:
+            return first.result()
+        error: BaseException = first.exception()
+        if is_answer(error):
+            raise error
+        pending.pop(first)
+
+    second = pool.try_submit(timed, tracker, backup, fn, is_answer)
+    if second is not None:
+        pending[second] = backup
+    elif not pending:
+        raise error
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            mode = pending.pop(future)
+            if future.exception() is None:
+                if mode == backup:
+                    tracker.record_hedge_won(backup)
+                return future.result()
+            error = future.exception()
+            if is_answer(error):
+                raise error
+    raise error
@@ -0,0 +1,158 @@
+from pathlib import Path
+from typing import Iterable, Optional
+from pydantic import BaseModel
+import datetime as dt
+import sqlite3
+import threading
+import time
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class PriceEstimate(BaseModel):
+    departure: str
+    arrival: str
+    samples: int
+    # Whether only observations made about as far ahead of departure as this search were used
+    matched_lead_time: bool
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+
+class PriceHistoryStats(BaseModel):
+    observations: int
+    routes: int
+    estimates: int
+    estimate_misses: int
+    # Fares deleted for being older than the retention window
+    purged: int
+
+
+def days_ahead(date: str, observed_at: float) -> Optional[int]:
+    """Whole days between an observation and the departure date it was for."""
+    try:
+        return (dt.date.fromisoformat(date) - dt.date.fromtimestamp(observed_at)).days
+    except ValueError:
+        return None
+
+
+class PriceHistory:
+    """
+    Fares seen upstream within the last `max_age_days` (every one with None), one row
+    per priced flight, in sqlite. Estimates are percentiles over a route's retained fares
+    for the same seat and passenger count, preferring fares observed a similar number of
+    days before departure. Older fares are purged at startup and every `purge_every`
+    recorded searches.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str | Path],
+        lead_time_window: int = 14,
+        min_samples: int = 5,
+        max_age_days: Optional[float] = None,
+        purge_every: int = 256,
+    ):
+        self.lead_time_window = lead_time_window
+        self.min_samples = min_samples
+        self.max_age_days = max_age_days
+        self.purge_every = purge_every
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.estimates = 0
+        self.estimate_misses = 0
+        self.purged = 0
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fares ("
+            "departure TEXT, arrival TEXT, date TEXT, days_ahead INTEGER, seat TEXT, travellers INTEGER, "
+            "max_stops INTEGER, price REAL, observed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fares_route ON fares (departure, arrival, seat, travellers)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fares_observed ON fares (observed_at)")
+        with self._lock:
+            self._purge()
+        self._conn.commit()
+
+    def _cutoff(self) -> float:
+        """observed_at of the oldest fare still retained."""
+        return time.time() - self.max_age_days * 86400 if self.max_age_days else 0.0
+
+    def _purge(self) -> None:
+        if self.max_age_days:
+            self.purged += self._conn.execute("DELETE FROM fares WHERE observed_at < ?", (self._cutoff(),)).rowcount
+
+    def record(
+        self, departure: str, arrival: str, date: str, seat: str, travellers: int, max_stops: Optional[int], prices: Iterable[float]
+    ) -> None:
+        now = time.time()
+        rows = [(departure, arrival, date, days_ahead(date, now), seat, travellers, max_stops, price, now) for price in prices]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT INTO fares VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge()
+            self._conn.commit()
+
+    def estimate(
+        self,
+        departure: str,
+        arrival: str,
+        date: str,
+        seat: str,
+        travellers: int,
+        max_stops: Optional[int] = None,
+        min_samples: Optional[int] = None,
+    ) -> Optional[PriceEstimate]:
+        """
+        Percentiles of past fares for the route, or None with fewer than `min_samples` (by
+        default the store's) of them. With `max_stops`, only fares seen by searches at least
+        that strict are used.
+        """
+        min_samples = self.min_samples if min_samples is None else min_samples
+        lead_time = days_ahead(date, time.time())
+        query = "SELECT price FROM fares WHERE departure = ? AND arrival = ? AND seat = ? AND travellers = ? AND observed_at >= ?"
+        params: tuple = (departure, arrival, seat, travellers, self._cutoff())
+        if max_stops is not None:
+            query += " AND max_stops IS NOT NULL AND max_stops <= ?"
+            params += (max_stops,)
+        with self._lock:
+            prices = []
+            matched = lead_time is not None
+            if matched:
+                prices = [row[0] for row in self._conn.execute(
+                    query + " AND days_ahead BETWEEN ? AND ?",
+                    params + (lead_time - self.lead_time_window, lead_time + self.lead_time_window),
+                )]
+            if len(prices) < min_samples:
+                matched = False
+                prices = [row[0] for row in self._conn.execute(query, params)]
+            if len(prices) < min_samples:
+                self.estimate_misses += 1
+                return None
+            self.estimates += 1
+
+        prices.sort()
+        quantiles = {f"p{q}": prices[int(q / 100 * (len(prices) - 1))] for q in PERCENTILES}
+        return PriceEstimate(departure=departure, arrival=arrival, samples=len(prices), matched_lead_time=matched, **quantiles)
+
+    def stats(self) -> PriceHistoryStats:
+        with self._lock:
+            observations, routes = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT departure || '-' || arrival) FROM fares"
+            ).fetchone()
+            return PriceHistoryStats(
+                observations=observations,
+                routes=routes,
+                estimates=self.estimates,
+                estimate_misses=self.estimate_misses,
+                purged=self.purged,
+            )
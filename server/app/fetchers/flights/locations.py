@@ -0,0 +1,213 @@
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+from rapidfuzz import process
+import unicodedata
+import math
+import re
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+COUNTRY_MATCH_THRESHOLD = 80
+CITY_MATCH_THRESHOLD = 75
+
+
+def normalize_name(name: str) -> str:
+    name = (
+        unicodedata.normalize("NFKD", name or "")
+        .encode("ascii", "ignore")
+        .decode()
+        .lower()
+    )
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def haversine_many(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance in miles from one point to many, in float64 whatever the inputs' dtype."""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats, dtype=np.float64)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs, dtype=np.float64) - math.radians(lng)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class AirportIndex:
+    """
+    Grid index over airport coordinates.
+
+    Airports are bucketed into `cell_degrees` lat/lng cells once at load. A radius query
+    only visits the cells overlapping the query's bounding box (widened by 1/cos(lat) so
+    the box stays correct away from the equator) and computes exact haversine distances
+    on those candidates. Queries whose box would reach a pole fall back to a vectorized
+    scan over every airport.
+
+    Countries are integer codes into `country_names` (-1 for none), and coordinates may
+    be float32, so the arrays can be used as stored without copies.
+    """
+
+    def __init__(self, countries: np.ndarray, country_names: Sequence[str], lats: np.ndarray, lngs: np.ndarray, cell_degrees: float = 1.0):
+        self.countries = countries
+        self._country_codes = {name: code for code, name in enumerate(country_names) if name}
+        self.lats = lats
+        self.lngs = lngs
+        self.cell_degrees = cell_degrees
+        self._lng_cells = int(math.ceil(360 / cell_degrees))
+
+        valid = ~(np.isnan(lats) | np.isnan(lngs))
+        self._valid = np.flatnonzero(valid)
+
+        buckets: dict[tuple[int, int], list[int]] = {}
+        for i in self._valid:
+            buckets.setdefault(self._cell(lats[i], lngs[i]), []).append(int(i))
+        self._cells = {key: np.array(idx, dtype=np.int64) for key, idx in buckets.items()}
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        row = int(math.floor(lat / self.cell_degrees))
+        col = int(math.floor((lng + 180) / self.cell_degrees)) % self._lng_cells
+        return row, col
+
+    def _candidates(self, lat: float, lng: float, radius: float) -> np.ndarray:
+        dlat = radius / MILES_PER_DEGREE_LAT
+        if abs(lat) + dlat >= 89.0:
+            return self._valid
+
+        dlng = dlat / math.cos(math.radians(abs(lat) + dlat))
+        if dlng >= 180:
+            return self._valid
+
+        row_lo, col_lo = self._cell(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._cell(lat + dlat, lng + dlng)
+        if col_hi < col_lo:  # query box crosses the antimeridian
+            cols = list(range(col_lo, self._lng_cells)) + list(range(0, col_hi + 1))
+        else:
+            cols = range(col_lo, col_hi + 1)
+
+        found = [
+            self._cells[(row, col)]
+            for row in range(row_lo, row_hi + 1)
+            for col in cols
+            if (row, col) in self._cells
+        ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def _filter_country(self, idx: np.ndarray, country_id: Optional[str]) -> np.ndarray:
+        if country_id is None or idx.size == 0:
+            return idx
+        code = self._country_codes.get(country_id)
+        if code is None:
+            return idx[:0]
+        return idx[self.countries[idx] == code]
+
+    def within(self, lat: float, lng: float, radius: float, country_id: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, distances in miles) of airports within `radius`, nearest first."""
+        idx = self._filter_country(self._candidates(lat, lng, radius), country_id)
+        dist = haversine_many(lat, lng, self.lats[idx], self.lngs[idx])
+        keep = dist <= radius
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return idx[order], dist[order]
+
+    def nearest(self, lat: float, lng: float, k: int, country_id: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return the `k` closest airports as (row indices, distances in miles), nearest first."""
+        radius = 50.0
+        while radius < EARTH_RADIUS_MILES * math.pi:
+            idx, dist = self.within(lat, lng, radius, country_id)
+            if len(idx) >= k:
+                return idx[:k], dist[:k]
+            radius *= 2
+
+        idx = self._filter_country(self._valid, country_id)
+        dist = haversine_many(lat, lng, self.lats[idx], self.lngs[idx])
+        order = np.argsort(dist, kind="stable")[:k]
+        return idx[order], dist[order]
+
+
+@dataclass(frozen=True)
+class CityMatch:
+    city: str
+    iso2: str
+    lat: float
+    lng: float
+
+
+class CityResolver:
+    """
+    Resolves (country, city) names to a city row.
+
+    Countries are normalized and mapped to ISO2 codes once; each country keeps a dict of
+    its normalized city names so exact hits are a dict lookup, and fuzzy matching only
+    ever runs over a single country's cities. When a name appears more than once in a
+    country, the first row wins (cities.csv is ordered by population).
+    """
+
+    def __init__(self, cities: Sequence[str], countries: Sequence[str], iso2s: Sequence[str], lats: np.ndarray, lngs: np.ndarray, country_codes: Mapping[str, str]):
+        self._names = cities
+        self._iso2s = iso2s
+        self._lats = lats
+        self._lngs = lngs
+
+        self._country_to_iso2: dict[str, str] = {normalize_name(k): v for k, v in country_codes.items()}
+        self._cities_by_country: dict[str, dict[str, int]] = {}
+        for i, (city, country, iso2) in enumerate(zip(cities, countries, iso2s)):
+            if not iso2:
+                continue
+            self._country_to_iso2.setdefault(normalize_name(country), iso2)
+            self._cities_by_country.setdefault(iso2, {}).setdefault(normalize_name(city), i)
+
+        self._country_names = list(self._country_to_iso2)
+        self._city_names = {iso2: list(names) for iso2, names in self._cities_by_country.items()}
+
+    def country_candidates(self, country: str) -> list[str]:
+        """
+        ISO2 codes `country` may name: the exact hit, if any, first, then every country
+        scoring at least COUNTRY_MATCH_THRESHOLD ("korea" is both North and South Korea).
+        """
+        key = normalize_name(country)
+        iso2 = self._country_to_iso2.get(key)
+        if iso2 is None and key.upper() in self._cities_by_country:
+            iso2 = key.upper()
+        candidates = [iso2] if iso2 is not None else []
+
+        for name, _, _ in process.extract(key, self._country_names, score_cutoff=COUNTRY_MATCH_THRESHOLD, limit=None):
+            iso2 = self._country_to_iso2[name]
+            if iso2 not in candidates:
+                candidates.append(iso2)
+        return candidates
+
+    def resolve_country(self, country: str) -> Optional[str]:
+        candidates = self.country_candidates(country)
+        return candidates[0] if candidates else None
+
+    def resolve(self, country: str, city: str) -> CityMatch:
+        """
+        The city row for `city` in the best of `country`'s candidate countries: the first
+        with an exact name hit, otherwise the highest fuzzy city score across all of them.
+        """
+        candidates = [iso2 for iso2 in self.country_candidates(country) if iso2 in self._cities_by_country]
+        if not candidates:
+            raise ValueError("Country not found")
+
+        key = normalize_name(city)
+        row = next((self._cities_by_country[iso2][key] for iso2 in candidates if key in self._cities_by_country[iso2]), None)
+        if row is None:
+            best_score = -1.0
+            for iso2 in candidates:
+                match = process.extractOne(key, self._city_names[iso2], score_cutoff=CITY_MATCH_THRESHOLD)
+                if match is not None and match[1] > best_score:
+                    best_score, row = match[1], self._cities_by_country[iso2][match[0]]
+            if row is None:
+                raise ValueError("City not found")
+
+        return CityMatch(
+            city=self._names[row],
+            iso2=self._iso2s[row],
+            lat=float(self._lats[row]),
+            lng=float(self._lngs[row]),
+        )
@@ -0,0 +1,72 @@
+from typing import Callable, Optional, Sequence, TypeVar
+import datetime as dt
+import heapq
+import re
+
+A = TypeVar("A")
+B = TypeVar("B")
+
+PRICE_RE = re.compile(r"\d+(?:\.\d+)?")
+CLOCK_RE = re.compile(r"(\d{1,2}):(\d{2})\s*([AP]M)", re.IGNORECASE)
+DAYS_AHEAD_RE = re.compile(r"\+(\d+)")
+
+
+def parse_price(price: str) -> Optional[float]:
+    """Numeric value of a scraped price such as "$1234" or "€89"; None when there is no price."""
+    match = PRICE_RE.search((price or "").replace(",", ""))
+    if match is None:
+        return None
+    value = float(match.group())
+    # fast_flights reports a missing price as "0"
+    return value if value > 0 else None
+
+
+def parse_clock(text: str, date: str, days_ahead: str = "") -> Optional[dt.datetime]:
+    """
+    Combine a scraped clock time ("6:05 PM on Mon, Sep 1") with the ISO date of the search.
+    `days_ahead` is the "+1" style marker fast_flights puts on overnight arrivals.
+    """
+    match = CLOCK_RE.search(text or "")
+    if match is None:
+        return None
+    try:
+        day = dt.date.fromisoformat(date)
+    except ValueError:
+        return None
+
+    hour, minute, meridiem = int(match.group(1)) % 12, int(match.group(2)), match.group(3).upper()
+    if meridiem == "PM":
+        hour += 12
+    ahead = DAYS_AHEAD_RE.search(days_ahead or "")
+    day += dt.timedelta(days=int(ahead.group(1)) if ahead else 0)
+    return dt.datetime.combine(day, dt.time(hour, minute))
+
+
+def k_smallest_pairs(
+    left: Sequence[tuple[float, A]],
+    right: Sequence[tuple[float, B]],
+    k: int,
+    accept: Optional[Callable[[A, B], bool]] = None,
+) -> list[tuple[float, A, B]]:
+    """
+    The `k` pairs with the smallest summed price, one item from each side, cheapest first.
+
+    Both sides must already be sorted by price. Pairs are popped from a heap in
+    non-decreasing order of their sum, so rejecting a pair through `accept` still leaves
+    the result exactly the `k` cheapest acceptable pairs.
+    """
+    if k <= 0 or not left or not right:
+        return []
+
+    pairs: list[tuple[float, A, B]] = []
+    heap = [(left[0][0] + right[0][0], 0, 0)]
+    while heap and len(pairs) < k:
+        total, i, j = heapq.heappop(heap)
+        if accept is None or accept(left[i][1], right[j][1]):
+            pairs.append((total, left[i][1], right[j][1]))
+        # Each (i, j) is pushed once: columns advance along every row, rows only from column 0
+        if j + 1 < len(right):
+            heapq.heappush(heap, (left[i][0] + right[j + 1][0], i, j + 1))
+        if j == 0 and i + 1 < len(left):
+            heapq.heappush(heap, (left[i + 1][0] + right[0][0], i + 1, 0))
+    return pairs
@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import astuple
+from typing import Optional
+import multiprocessing
+import threading
+
+from fast_flights import Flight, Result
+from fast_flights.core import fetch, parse_response
+from fast_flights.fallback_playwright import fallback_playwright_fetch
+from fast_flights.filter import TFSData
+
+# A Flight's fields in declaration order; cheap to pickle across processes
+FlightRecord = tuple
+
+
+class _Page:
+    """The parts of a fast_flights response that parse_response reads."""
+
+    def __init__(self, text: str):
+        self.text = text
+        # Only used for the "No flights found" message, which we don't surface
+        self.text_markdown = ""
+
+
+def parse_page(html: str, limit: Optional[int] = None) -> tuple[str, list[FlightRecord]]:
+    """Parse a results page into (current_price, flight records), keeping the first `limit` flights."""
+    result = parse_response(_Page(html))
+    return result.current_price, [astuple(flight) for flight in result.flights[:limit]]
+
+
+def to_result(current_price: str, records: list[FlightRecord]) -> Result:
+    return Result(current_price=current_price, flights=[Flight(*record) for record in records])
+
+
+def fetch_page(flight_filter: TFSData, mode: str) -> str:
+    """The results page for a search, fetched the way fast_flights does for `mode`, without parsing it."""
+    params = {
+        "tfs": flight_filter.as_b64().decode("utf-8"),
+        "hl": "en",
+        "tfu": "EgQIABABIgA",
+        "curr": "",
+    }
+    if mode in {"common", "fallback"}:
+        try:
+            return fetch(params).text
+        except AssertionError:
+            if mode != "fallback":
+                raise
+            return fallback_playwright_fetch(params).text
+    if mode == "local":
+        from fast_flights.local_playwright import local_playwright_fetch
+
+        return local_playwright_fetch(params).text
+    return fallback_playwright_fetch(params).text
+
+
+class ParsePool:
+    """
+    Searches that fetch on the calling thread and parse in a pool of `processes` worker
+    processes, so page decoding isn't serialized by the GIL. Workers are spawned on first
+    use and only exchange page text and flight records with this process.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn rather than fork: the server process is full of threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def parse(self, html: str, limit: Optional[int] = None) -> Result:
+        return to_result(*self._pool().submit(parse_page, html, limit).result())
+
+    def search(self, flight_filter: TFSData, mode: str, limit: Optional[int] = None) -> Result:
+        html = fetch_page(flight_filter, mode)
+        try:
+            return self.parse(html, limit)
+        except RuntimeError:
+            # fast_flights retries an unparseable "fallback" page through the playwright service
+            if mode == "fallback":
+                return self.search(flight_filter, "force-fallback", limit)
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
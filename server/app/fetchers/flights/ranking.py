@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+# How much being at the edge of the search radius costs an airport, relative to one
+# in the city centre
+DISTANCE_WEIGHT = 0.2
+
+
+@dataclass(frozen=True)
+class RankedAirport:
+    code: str
+    distance: float
+    service_score: float
+    score: float
+    metro: Optional[str] = None
+
+
+def rank_airports(
+    codes: Sequence[str],
+    distances: Sequence[float],
+    service_scores: Sequence[float],
+    radius: float,
+    metros: Optional[Sequence[Optional[str]]] = None,
+) -> list[RankedAirport]:
+    """
+    Order airports by how worth searching they are: the passenger-service score from
+    airports.csv, discounted by distance from the city centre. Best first. `metros` holds
+    each airport's metro-area code, if any.
+    """
+    ranked = [
+        RankedAirport(
+            code=code,
+            distance=float(distance),
+            service_score=float(service_score),
+            score=float(service_score) * (1 - DISTANCE_WEIGHT * min(float(distance) / radius, 1.0)) if radius else float(service_score),
+            metro=metro or None,
+        )
+        for code, distance, service_score, metro in zip(codes, distances, service_scores, metros or [None] * len(codes))
+    ]
+    ranked.sort(key=lambda airport: airport.score, reverse=True)
+    return ranked
+
+
+def rank_pairs(
+    origins: Sequence[RankedAirport],
+    destinations: Sequence[RankedAirport],
+    max_pairs: Optional[int],
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """
+    Split the origin x destination cross product into the `max_pairs` best pairs (by the
+    product of both airport scores) and the pruned rest. Both lists are best first.
+    """
+    pairs = [
+        (origin.score * destination.score, origin.code, destination.code)
+        for origin in origins
+        for destination in destinations
+        if origin.code != destination.code
+    ]
+    pairs.sort(key=lambda pair: pair[0], reverse=True)
+    ordered = [(origin, destination) for _, origin, destination in pairs]
+    if max_pairs is None:
+        return ordered, []
+    return ordered[:max_pairs], ordered[max_pairs:]
+
+
+def collapse_metros(airports: Sequence[RankedAirport]) -> tuple[list[RankedAirport], dict[str, list[str]]]:
+    """
+    Replace airports sharing a metro-area code (JFK, LGA, EWR -> NYC) with one entry for
+    the metro, scored as its best member, so a single search covers all of them. Airports
+    alone in their metro, or in none, are kept as they are. Returns the entries best first
+    and each collapsed metro's member airports.
+    """
+    members: dict[str, list[RankedAirport]] = {}
+    for airport in airports:
+        if airport.metro:
+            members.setdefault(airport.metro, []).append(airport)
+
+    collapsed = []
+    for airport in airports:
+        group = members.get(airport.metro) if airport.metro else None
+        if group is None or len(group) < 2:
+            collapsed.append(airport)
+        elif group[0] is airport:
+            best = max(group, key=lambda member: member.score)
+            collapsed.append(RankedAirport(
+                code=airport.metro,
+                distance=min(member.distance for member in group),
+                service_score=best.service_score,
+                score=best.score,
+                metro=airport.metro,
+            ))
+    collapsed.sort(key=lambda airport: airport.score, reverse=True)
+    return collapsed, {
+        metro: [member.code for member in group] for metro, group in members.items() if len(group) >= 2
+    }
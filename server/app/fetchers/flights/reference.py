@@ -0,0 +1,240 @@
+"""
+Compiles airports.csv and cities.csv into a directory of .npy arrays that load without
+CSV parsing and can be memory-mapped, so forked workers share the pages:
+
+    python -m app.fetchers.flights.reference [out_dir]
+"""
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterator, Optional
+import json
+import logging
+import os
+import sys
+import threading
+
+import numpy as np
+
+from app.fetchers.flights._types import COUNTRY_TO_ISO_CODE
+from app.fetchers.flights.locations import AirportIndex, CityResolver
+
+REFERENCE_VERSION = 1
+
+AIRPORTS_FILE_PATH = Path(__file__).parent / "airports.csv"
+CITIES_FILE_PATH = Path(__file__).parent / "cities.csv"
+
+
+def _categorical(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    """(codes, categories) with "" as code -1; categories in first-seen order."""
+    categories: dict[str, int] = {}
+    codes = np.array([categories.setdefault(v, len(categories)) if v else -1 for v in values], dtype=np.int16)
+    return codes, list(categories)
+
+
+def _string_table(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """One UTF-8 blob plus len(values) + 1 offsets into it."""
+    encoded = [v.encode() for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class StringTable(Sequence):
+    """Read-only view of a _string_table; each string is decoded when it is read."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes().decode()
+
+    def __iter__(self) -> Iterator[str]:
+        data = self._blob.tobytes()
+        bounds = self._offsets.tolist()
+        return (data[start:end].decode() for start, end in zip(bounds, bounds[1:]))
+
+
+class Categorical(Sequence):
+    """Read-only view of _categorical codes as their category strings ("" for code -1)."""
+
+    def __init__(self, codes: np.ndarray, categories: list[str]):
+        self.codes = codes
+        self.categories = categories + [""]  # code -1 picks the trailing ""
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.categories[self.codes[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.categories[code] for code in self.codes.tolist())
+
+    def take(self, idx: np.ndarray) -> list[str]:
+        return [self.categories[code] for code in self.codes[idx].tolist()]
+
+
+def build_reference(out_dir: str | Path, airports_csv: Path = AIRPORTS_FILE_PATH, cities_csv: Path = CITIES_FILE_PATH) -> None:
+    import pandas as pd
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    # keep_default_na=False so Namibia's "NA" country code isn't read as a missing value
+    airports = pd.read_csv(airports_csv, keep_default_na=False, na_values=[""])
+    cities = pd.read_csv(cities_csv, keep_default_na=False, na_values=[""])
+
+    points = airports["location"].astype(str).str.extract(r"POINT \((\S+) (\S+)\)")
+    airport_countries, airport_country_names = _categorical(airports["country_id"].fillna("").astype(str).tolist())
+    # A metro code that is also an airport code would make a metro search ambiguous upstream
+    metro_codes = airports["metro_code"].fillna("").astype(str)
+    ambiguous = sorted(set(metro_codes) & set(airports["code"].astype(str)))
+    if ambiguous:
+        logging.warning(f"Ignoring metro codes that are also airport codes: {', '.join(ambiguous)}")
+    airport_metros, metro_names = _categorical(metro_codes.where(~metro_codes.isin(ambiguous), "").tolist())
+    city_countries, city_country_names = _categorical(cities["country"].fillna("").astype(str).tolist())
+    city_iso2s, city_iso2_names = _categorical(cities["iso2"].fillna("").astype(str).tolist())
+    city_blob, city_offsets = _string_table(cities["city"].astype(str).tolist())
+
+    arrays = {
+        # Unparseable locations become NaN and are never matched
+        "airport_lat": pd.to_numeric(points[1], errors="coerce").to_numpy(dtype=np.float32),
+        "airport_lng": pd.to_numeric(points[0], errors="coerce").to_numpy(dtype=np.float32),
+        "airport_code": airports["code"].astype(str).to_numpy(dtype="S4"),
+        "airport_country": airport_countries,
+        "airport_metro": airport_metros,
+        "airport_service_score": airports["service_score"].to_numpy(dtype=np.float32),
+        "city_lat": cities["lat"].to_numpy(dtype=np.float32),
+        "city_lng": cities["lng"].to_numpy(dtype=np.float32),
+        "city_country": city_countries,
+        "city_iso2": city_iso2s,
+        "city_name_blob": city_blob,
+        "city_name_offsets": city_offsets,
+    }
+    # Every file is written aside and renamed into place, so concurrent builds never expose a partial file
+    for name, array in arrays.items():
+        tmp = out / f"{name}.npy.{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, out / f"{name}.npy")
+
+    # Written last: a directory without meta.json is an unfinished build
+    tmp = out / f"meta.json.{os.getpid()}"
+    tmp.write_text(json.dumps({
+        "version": REFERENCE_VERSION,
+        "sources": {path.name: path.stat().st_mtime for path in (Path(airports_csv), Path(cities_csv))},
+        "airport_countries": airport_country_names,
+        "metros": metro_names,
+        "city_countries": city_country_names,
+        "city_iso2s": city_iso2_names,
+    }))
+    os.replace(tmp, out / "meta.json")
+
+
+def is_current(out_dir: str | Path, airports_csv: Path = AIRPORTS_FILE_PATH, cities_csv: Path = CITIES_FILE_PATH) -> bool:
+    """Whether `out_dir` holds a finished build of this version made from the current CSVs."""
+    try:
+        meta = json.loads((Path(out_dir) / "meta.json").read_text())
+    except (OSError, ValueError):
+        return False
+    sources = meta.get("sources", {})
+    return meta.get("version") == REFERENCE_VERSION and all(
+        sources.get(path.name, -1) >= path.stat().st_mtime for path in (Path(airports_csv), Path(cities_csv))
+    )
+
+
+class ReferenceData:
+    """
+    Airport and city lookups backed by a build_reference directory. Arrays are loaded
+    (or memory-mapped) on construction and used as stored: codes, coordinates and city
+    names are only decoded for the rows a lookup returns. The airport index and city
+    resolver are built on first use; the resolver's per-country name dicts are the only
+    per-row Python objects.
+    """
+
+    def __init__(self, path: str | Path, mmap: bool = False):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        load = lambda name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None)
+
+        self.airport_codes = load("airport_code")
+        self.airport_lats = load("airport_lat")
+        self.airport_lngs = load("airport_lng")
+        self.airport_service_scores = load("airport_service_score")
+        self.airport_country_ids = Categorical(load("airport_country"), meta["airport_countries"])
+        self.airport_metros = Categorical(load("airport_metro"), meta["metros"])
+        self._city_arrays = {name: load(name) for name in ("city_lat", "city_lng", "city_name_blob", "city_name_offsets", "city_country", "city_iso2")}
+        self._city_categories = (meta["city_countries"], meta["city_iso2s"])
+
+        self._lock = threading.Lock()
+        self._airport_index: Optional[AirportIndex] = None
+        self._city_resolver: Optional[CityResolver] = None
+        self._metro_airports: Optional[dict[str, list[str]]] = None
+
+    def airports(self, idx: np.ndarray) -> dict[str, list]:
+        """The airports at row indices `idx` as parallel columns."""
+        return {
+            "code": [code.decode() for code in self.airport_codes[idx].tolist()],
+            "country_id": self.airport_country_ids.take(idx),
+            # Scores are stored as float32; airports.csv gives them to two decimals
+            "service_score": self.airport_service_scores[idx].astype(np.float64).round(4).tolist(),
+            "metro_code": self.airport_metros.take(idx),
+        }
+
+    @property
+    def airport_index(self) -> AirportIndex:
+        with self._lock:
+            if self._airport_index is None:
+                self._airport_index = AirportIndex(
+                    countries=self.airport_country_ids.codes,
+                    country_names=self.airport_country_ids.categories,
+                    lats=self.airport_lats,
+                    lngs=self.airport_lngs,
+                )
+            return self._airport_index
+
+    @property
+    def city_resolver(self) -> CityResolver:
+        with self._lock:
+            if self._city_resolver is None:
+                arrays = self._city_arrays
+                countries, iso2s = self._city_categories
+                self._city_resolver = CityResolver(
+                    cities=StringTable(arrays["city_name_blob"], arrays["city_name_offsets"]),
+                    countries=Categorical(arrays["city_country"], countries),
+                    iso2s=Categorical(arrays["city_iso2"], iso2s),
+                    lats=arrays["city_lat"],
+                    lngs=arrays["city_lng"],
+                    country_codes=COUNTRY_TO_ISO_CODE,
+                )
+            return self._city_resolver
+
+    @property
+    def metro_airports(self) -> dict[str, list[str]]:
+        """Every airport each metro-area code covers upstream, including ones outside any search radius."""
+        with self._lock:
+            if self._metro_airports is None:
+                metros: dict[str, list[str]] = {}
+                for code, metro in zip(self.airport_codes.tolist(), self.airport_metros):
+                    if metro:
+                        metros.setdefault(metro, []).append(code.decode())
+                self._metro_airports = metros
+            return self._metro_airports
+
+
+def load_reference(path: str | Path, mmap: bool = False) -> ReferenceData:
+    """The reference data at `path`, rebuilding it first when missing or older than the CSVs."""
+    if not is_current(path):
+        logging.info(f"Building flight reference data in {path}")
+        build_reference(path)
+    return ReferenceData(path, mmap=mmap)
+
+
+if __name__ == "__main__":
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else ".data/reference"
+    build_reference(out_dir)
+    print(f"Wrote flight reference data to {out_dir}")
@@ -0,0 +1,77 @@
+from fast_flights import Flight
+from typing import Any, Callable, Hashable, Iterable, Optional, Sequence, TypeVar
+import base64
+import binascii
+import hashlib
+import json
+
+T = TypeVar("T")
+
+
+def itinerary_key(flight: Flight) -> Hashable:
+    """
+    What makes two scraped flights the same itinerary, whichever pair search found them.
+    Airports are part of it: JFK-LHR and EWR-LHR with the same carrier and times differ.
+    Flights without times (history estimates) never match anything else.
+    """
+    if not flight.departure:
+        return id(flight)
+    return (
+        getattr(flight, "from_airport", None), getattr(flight, "to_airport", None),
+        flight.name, flight.departure, flight.arrival, flight.arrival_time_ahead, flight.duration, flight.stops,
+    )
+
+
+def unique_flights(items: Iterable[T], flight_of: Callable[[T], Flight]) -> list[T]:
+    """The first item of each itinerary; pass them cheapest first to keep the cheapest."""
+    seen: set[Hashable] = set()
+    unique = []
+    for item in items:
+        key = itinerary_key(flight_of(item))
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def request_digest(payload: Any) -> str:
+    """A short stable hash of a JSON-serializable request, to tie cursors to the search they page."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+def encode_cursor(offset: int, digest: str) -> str:
+    return base64.urlsafe_b64encode(f"offset:{offset}:{digest}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> tuple[int, Optional[str]]:
+    """
+    The offset and request digest a cursor from encode_cursor carries; (0, None) without
+    a cursor. Raises ValueError for anything else.
+    """
+    if not cursor:
+        return 0, None
+    try:
+        prefix, offset, digest = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        if prefix == "offset" and offset.isdigit() and digest:
+            return int(offset), digest
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise ValueError("Invalid cursor")
+
+
+def project(data: dict[str, Any], fields: Sequence[str]) -> dict[str, Any]:
+    """Only the dotted `fields` of `data`, e.g. ["total_price", "flight.price"]. Missing fields are left out."""
+    projected: dict[str, Any] = {}
+    for path in fields:
+        parts = path.split(".")
+        value: Any = data
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
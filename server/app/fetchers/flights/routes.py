@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel
+import datetime as dt
+import sqlite3
+import threading
+import time
+
+SEASONS = {12: "winter", 1: "winter", 2: "winter", 3: "spring", 4: "spring", 5: "spring",
+           6: "summer", 7: "summer", 8: "summer", 9: "autumn", 10: "autumn", 11: "autumn"}
+
+RouteKey = tuple[str, str, int, str]
+
+
+class RouteIndexStats(BaseModel):
+    routes: int
+    dead_routes: int
+    lookups: int
+    dead_hits: int
+    hit_rate: float
+
+
+def route_key(departure: str, arrival: str, date: str) -> RouteKey:
+    """(departure, arrival, weekday, season) of a search; service is often weekday or season specific."""
+    try:
+        day = dt.date.fromisoformat(date)
+        return departure, arrival, day.weekday(), SEASONS[day.month]
+    except ValueError:
+        return departure, arrival, -1, ""
+
+
+class RouteAvailabilityIndex:
+    """
+    Remembers airport pairs that came back with no service. A route counts as dead once
+    `dead_after` searches in a row found nothing, until `decay_s` seconds pass without a
+    new miss; after that it is searched again. Any successful search revives it.
+
+    Entries are kept in memory and, when `path` is given, written through to sqlite so
+    they survive restarts.
+    """
+
+    def __init__(self, path: Optional[str | Path], dead_after: int = 2, decay_s: float = 14 * 86400):
+        self.dead_after = dead_after
+        self.decay_s = decay_s
+        self._routes: dict[RouteKey, tuple[int, float]] = {}  # key -> (consecutive misses, last miss)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.dead_hits = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS routes ("
+                "departure TEXT, arrival TEXT, weekday INTEGER, season TEXT, misses INTEGER, last_miss REAL, "
+                "PRIMARY KEY (departure, arrival, weekday, season))"
+            )
+            self._conn.execute("DELETE FROM routes WHERE last_miss < ?", (time.time() - decay_s,))
+            self._conn.commit()
+            for departure, arrival, weekday, season, misses, last_miss in self._conn.execute("SELECT * FROM routes"):
+                self._routes[(departure, arrival, weekday, season)] = (misses, last_miss)
+
+    def is_dead(self, departure: str, arrival: str, date: str) -> bool:
+        key = route_key(departure, arrival, date)
+        with self._lock:
+            self.lookups += 1
+            entry = self._routes.get(key)
+            dead = entry is not None and entry[0] >= self.dead_after and time.time() - entry[1] < self.decay_s
+            if dead:
+                self.dead_hits += 1
+            return dead
+
+    def record(self, departure: str, arrival: str, date: str, has_service: bool) -> None:
+        key = route_key(departure, arrival, date)
+        now = time.time()
+        with self._lock:
+            if has_service:
+                if self._routes.pop(key, None) is not None and self._conn is not None:
+                    self._conn.execute(
+                        "DELETE FROM routes WHERE departure = ? AND arrival = ? AND weekday = ? AND season = ?", key
+                    )
+                    self._conn.commit()
+                return
+
+            misses, last_miss = self._routes.get(key, (0, now))
+            if now - last_miss >= self.decay_s:
+                misses = 0
+            self._routes[key] = (misses + 1, now)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?)", (*key, misses + 1, now))
+                self._conn.commit()
+
+    def stats(self) -> RouteIndexStats:
+        now = time.time()
+        with self._lock:
+            return RouteIndexStats(
+                routes=len(self._routes),
+                dead_routes=sum(
+                    1 for misses, last_miss in self._routes.values()
+                    if misses >= self.dead_after and now - last_miss < self.decay_s
+                ),
+                lookups=self.lookups,
+                dead_hits=self.dead_hits,
+                hit_rate=round(self.dead_hits / self.lookups, 4) if self.lookups else 0.0,
+            )
@@ -0,0 +1,184 @@
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from pydantic import BaseModel
+import threading
+import time
+
+
+class SchedulerStats(BaseModel):
+    max_concurrency: int
+    per_session_limit: Optional[int]
+    active: int
+    queue_depth: int
+    sessions: int
+    submitted: int
+    completed: int
+    cancelled: int
+    avg_wait_ms: float
+    p95_wait_ms: float
+    max_wait_ms: float
+
+
+@dataclass
+class _Task:
+    future: Future
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class SearchSession:
+    """
+    One request's view of a SearchScheduler. Tasks submitted here queue separately from
+    other sessions' tasks and the scheduler serves sessions round-robin, so a request with
+    many searches cannot starve one with a few. Leaving the context cancels anything still
+    queued.
+    """
+
+    def __init__(self, scheduler: "SearchScheduler", max_in_flight: Optional[int]):
+        self._scheduler = scheduler
+        self.max_in_flight = max_in_flight
+        self._pending: deque[_Task] = deque()
+        self._in_flight = 0
+        self._closed = False
+
+    def __enter__(self) -> "SearchSession":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        return self._scheduler._submit(self, _Task(Future(), fn, args, kwargs))
+
+    def cancel_pending(self) -> int:
+        """Cancel every task that hasn't started yet. Returns how many were cancelled."""
+        return self._scheduler._cancel_pending(self)
+
+    def close(self) -> None:
+        self._scheduler._close(self)
+
+
+class SearchScheduler:
+    """
+    Process-wide, bounded pool for upstream flight searches.
+
+    A fixed set of `max_concurrency` worker threads serve every session's queue in turn,
+    with at most `per_session_limit` tasks of one session running at once. Queue depth and
+    queue wait times are tracked for the stats endpoint.
+    """
+
+    def __init__(self, max_concurrency: int, per_session_limit: Optional[int] = None, name: str = "flight-search", wait_samples: int = 1024):
+        self.max_concurrency = max_concurrency
+        self.per_session_limit = per_session_limit
+        self.name = name
+        self._cond = threading.Condition()
+        self._sessions: deque[SearchSession] = deque()
+        self._workers: list[threading.Thread] = []
+        self._waits: deque[float] = deque(maxlen=wait_samples)
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._cancelled = 0
+
+    def session(self, max_in_flight: Optional[int] = None) -> SearchSession:
+        session = SearchSession(self, max_in_flight or self.per_session_limit)
+        with self._cond:
+            self._sessions.append(session)
+        return session
+
+    def _ensure_workers(self) -> None:
+        if self._workers:
+            return
+        for i in range(self.max_concurrency):
+            worker = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _submit(self, session: SearchSession, task: _Task) -> Future:
+        with self._cond:
+            if session._closed:
+                raise RuntimeError("Cannot submit to a closed search session")
+            self._ensure_workers()
+            session._pending.append(task)
+            self._submitted += 1
+            self._cond.notify()
+        return task.future
+
+    def _cancel_pending(self, session: SearchSession) -> int:
+        with self._cond:
+            tasks = list(session._pending)
+            session._pending.clear()
+            self._cancelled += len(tasks)
+        for task in tasks:
+            task.future.cancel()
+        return len(tasks)
+
+    def _close(self, session: SearchSession) -> None:
+        self._cancel_pending(session)
+        with self._cond:
+            session._closed = True
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _pick(self) -> Optional[tuple[SearchSession, _Task]]:
+        # Caller holds self._cond. Rotating after every look keeps service round-robin.
+        for _ in range(len(self._sessions)):
+            session = self._sessions[0]
+            self._sessions.rotate(-1)
+            if not session._pending:
+                continue
+            if session.max_in_flight is not None and session._in_flight >= session.max_in_flight:
+                continue
+            session._in_flight += 1
+            return session, session._pending.popleft()
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                picked = self._pick()
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._pick()
+                session, task = picked
+                self._active += 1
+
+            ran = task.future.set_running_or_notify_cancel()
+            if ran:
+                wait = time.monotonic() - task.enqueued_at
+                try:
+                    task.future.set_result(task.fn(*task.args, **task.kwargs))
+                except BaseException as e:
+                    task.future.set_exception(e)
+
+            with self._cond:
+                session._in_flight -= 1
+                self._active -= 1
+                if ran:
+                    self._completed += 1
+                    self._waits.append(wait)
+                else:
+                    self._cancelled += 1
+                # A finished task may unblock a session that was at its in-flight limit
+                self._cond.notify_all()
+
+    def stats(self) -> SchedulerStats:
+        with self._cond:
+            waits = sorted(self._waits)
+            return SchedulerStats(
+                max_concurrency=self.max_concurrency,
+                per_session_limit=self.per_session_limit,
+                active=self._active,
+                queue_depth=sum(len(s._pending) for s in self._sessions),
+                sessions=len(self._sessions),
+                submitted=self._submitted,
+                completed=self._completed,
+                cancelled=self._cancelled,
+                avg_wait_ms=round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+                p95_wait_ms=round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                max_wait_ms=round(1000 * waits[-1], 2) if waits else 0.0,
+            )
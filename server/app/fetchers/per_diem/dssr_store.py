@@ -0,0 +1,261 @@
+"""
+Local snapshot of the State Department (DSSR) per diem tables. An ingestion job scrapes
+every country into sqlite and the per-diem request path reads from it:
+
+    python -m app.fetchers.per_diem.dssr_store
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+from pydantic import BaseModel
+import datetime as dt
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import requests
+
+from app.fetchers.per_diem._types import CountryCode
+from app.fetchers.per_diem.scrapers.dssr import FORM_URL, PerDiemRow, fetch_dos_per_diem
+
+# Where the snapshot lives, how often it is re-scraped, and how many countries are scraped at once
+DSSR_SNAPSHOT_PATH = os.getenv("DSSR_SNAPSHOT_PATH", ".data/dssr.sqlite")
+DSSR_REFRESH_HOURS = float(os.getenv("DSSR_REFRESH_HOURS", "24"))
+DSSR_REFRESH_WORKERS = int(os.getenv("DSSR_REFRESH_WORKERS", "4"))
+
+
+class DssrSnapshotStats(BaseModel):
+    countries: int
+    rows: int
+    oldest_snapshot: Optional[dt.datetime]
+    newest_snapshot: Optional[dt.datetime]
+    # Seconds since the stalest country was scraped
+    snapshot_age_s: Optional[float]
+    # Country scrapes that failed since startup, leaving the previous snapshot in place
+    refresh_failures: int
+
+
+def normalize_post(name: str) -> str:
+    return (
+        unicodedata.normalize("NFKD", name or "")
+        .encode("ascii", "ignore")
+        .decode()
+        .strip()
+        .lower()
+    )
+
+
+def _season_contains(begin: str, end: str, when: dt.date) -> bool:
+    """Whether a DSSR season ("MM/DD" to "MM/DD", possibly wrapping the new year) covers `when`."""
+    try:
+        b_month, b_day = (int(part) for part in begin.split("/")[:2])
+        e_month, e_day = (int(part) for part in end.split("/")[:2])
+    except ValueError:
+        return True
+    day = (when.month, when.day)
+    if (b_month, b_day) <= (e_month, e_day):
+        return (b_month, b_day) <= day <= (e_month, e_day)
+    return day >= (b_month, b_day) or day <= (e_month, e_day)
+
+
+class DssrStore:
+    """
+    DSSR rows per country in sqlite, indexed by country and normalized post name. Each
+    country's rows are replaced as a whole when it is re-scraped, so a failed scrape
+    leaves the previous snapshot in place.
+    """
+
+    def __init__(self, path: Optional[str | Path]):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS rates ("
+            " country TEXT, position INTEGER, post_norm TEXT, country_name TEXT, post_name TEXT,"
+            " season_begin TEXT, season_end TEXT, max_lodging_rate INTEGER, mie_rate INTEGER,"
+            " max_per_diem_rate INTEGER, footnote_numbers TEXT, footnote_url TEXT, effective_date TEXT,"
+            " PRIMARY KEY (country, position));"
+            "CREATE INDEX IF NOT EXISTS rates_post ON rates (country, post_norm);"
+            "CREATE TABLE IF NOT EXISTS snapshots (country TEXT PRIMARY KEY, fetched_at REAL);"
+        )
+        self._conn.commit()
+        self.refresh_failures = 0
+
+    def replace_country(self, country: CountryCode, rows: List[PerDiemRow]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rates WHERE country = ?", (country.value,))
+            self._conn.executemany(
+                "INSERT INTO rates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        country.value, position, normalize_post(row.post_name), row.country_name, row.post_name,
+                        row.season_begin, row.season_end, row.max_lodging_rate, row.mie_rate, row.max_per_diem_rate,
+                        json.dumps(row.footnote_numbers) if row.footnote_numbers is not None else None,
+                        row.footnote_url, row.effective_date.isoformat(),
+                    )
+                    for position, row in enumerate(rows)
+                ],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (country.value, time.time()))
+
+    def fetched_at(self, country: CountryCode) -> Optional[float]:
+        with self._lock:
+            found = self._conn.execute("SELECT fetched_at FROM snapshots WHERE country = ?", (country.value,)).fetchone()
+        return found[0] if found else None
+
+    def _select(self, where: str, params: tuple) -> List[PerDiemRow]:
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT country_name, post_name, season_begin, season_end, max_lodging_rate, mie_rate,"
+                " max_per_diem_rate, footnote_numbers, footnote_url, effective_date"
+                f" FROM rates WHERE {where} ORDER BY position",
+                params,
+            ).fetchall()
+        return [
+            PerDiemRow(
+                country_name=country_name,
+                post_name=post_name,
+                season_begin=season_begin,
+                season_end=season_end,
+                max_lodging_rate=max_lodging_rate,
+                mie_rate=mie_rate,
+                max_per_diem_rate=max_per_diem_rate,
+                footnote_numbers=json.loads(footnotes) if footnotes is not None else None,
+                footnote_url=footnote_url,
+                effective_date=dt.date.fromisoformat(effective_date),
+            )
+            for (country_name, post_name, season_begin, season_end, max_lodging_rate, mie_rate,
+                 max_per_diem_rate, footnotes, footnote_url, effective_date) in found
+        ]
+
+    def rows(self, country: CountryCode) -> List[PerDiemRow]:
+        return self._select("country = ?", (country.value,))
+
+    def lookup(self, country: CountryCode, post: str, when: Optional[dt.date] = None) -> Optional[PerDiemRow]:
+        """
+        The row for `post` in `country` whose season covers `when` (today by default),
+        falling back to the country's "Other" row when the post isn't listed, and to its
+        last row when there is no "Other" row. None only for a country without rows.
+        """
+        when = when or dt.date.today()
+        for post_norm in (normalize_post(post), "other"):
+            rows = self._select("country = ? AND post_norm = ?", (country.value, post_norm))
+            if rows:
+                return next((r for r in rows if _season_contains(r.season_begin, r.season_end, when)), rows[0])
+        rows = self.rows(country)
+        return rows[-1] if rows else None
+
+    def record_refresh_failure(self) -> None:
+        with self._lock:
+            self.refresh_failures += 1
+
+    def stats(self) -> DssrSnapshotStats:
+        with self._lock:
+            countries, oldest, newest = self._conn.execute(
+                "SELECT COUNT(*), MIN(fetched_at), MAX(fetched_at) FROM snapshots"
+            ).fetchone()
+            rows = self._conn.execute("SELECT COUNT(*) FROM rates").fetchone()[0]
+            refresh_failures = self.refresh_failures
+        return DssrSnapshotStats(
+            countries=countries,
+            rows=rows,
+            oldest_snapshot=dt.datetime.fromtimestamp(oldest) if oldest else None,
+            newest_snapshot=dt.datetime.fromtimestamp(newest) if newest else None,
+            snapshot_age_s=round(time.time() - oldest, 1) if oldest else None,
+            refresh_failures=refresh_failures,
+        )
+
+
+dssr_store = DssrStore(DSSR_SNAPSHOT_PATH or None)
+
+
+def refresh_country(country: CountryCode, session: Optional[requests.Session] = None) -> int:
+    """
+    Scrape one country into the store. Returns the number of rows stored. An empty scrape
+    is recorded for a country without rows, so it isn't scraped again until the next
+    refresh, but never replaces rows already stored.
+    """
+    rows = fetch_dos_per_diem(country, session=session)
+    if rows or not dssr_store.rows(country):
+        dssr_store.replace_country(country, rows)
+    return len(rows)
+
+
+_ingest_lock = threading.Lock()
+_ingesting: dict[CountryCode, threading.Lock] = {}
+
+
+def ensure_country(country: CountryCode) -> None:
+    """
+    Scrape `country` if the store has never ingested it. Concurrent callers for the same
+    country wait for one scrape instead of starting their own.
+    """
+    if dssr_store.fetched_at(country) is not None:
+        return
+    with _ingest_lock:
+        lock = _ingesting.setdefault(country, threading.Lock())
+    with lock:
+        if dssr_store.fetched_at(country) is None:
+            try:
+                refresh_country(country)
+            except Exception:
+                dssr_store.record_refresh_failure()
+                raise
+
+
+def refresh_snapshot(
+    countries: Iterable[CountryCode] = CountryCode,
+    max_age_s: float = 0.0,
+    workers: int = DSSR_REFRESH_WORKERS,
+) -> int:
+    """
+    Scrape every country whose snapshot is older than `max_age_s` (all of them by
+    default). Failures are logged and keep the previous snapshot. Returns how many
+    countries were refreshed.
+    """
+    now = time.time()
+    stale = [c for c in countries if now - (dssr_store.fetched_at(c) or 0.0) >= max_age_s]
+    sessions = threading.local()
+
+    def refresh(country: CountryCode) -> bool:
+        try:
+            if not hasattr(sessions, "session"):
+                session = requests.Session()
+                session.get(FORM_URL, timeout=15)  # prime cookies once per worker
+                sessions.session = session
+            return refresh_country(country, sessions.session) > 0
+        except Exception as e:
+            logging.warning(f"DSSR refresh failed for {country.name}: {e}")
+            dssr_store.record_refresh_failure()
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="dssr-refresh") as executor:
+        return sum(executor.map(refresh, stale))
+
+
+def start_refresh_thread(interval_hours: float = DSSR_REFRESH_HOURS) -> threading.Thread:
+    """Keep the snapshot fresh in the background: re-scrape countries older than the interval, then sleep."""
+    def loop() -> None:
+        while True:
+            try:
+                refreshed = refresh_snapshot(max_age_s=interval_hours * 3600)
+                if refreshed:
+                    logging.info(f"Refreshed DSSR rates for {refreshed} countries")
+            except Exception as e:
+                logging.warning(f"DSSR refresh failed: {e}")
+            time.sleep(max(interval_hours * 3600 / 24, 60))
+
+    thread = threading.Thread(target=loop, name="dssr-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Refreshed {refresh_snapshot()} countries into {DSSR_SNAPSHOT_PATH}")
@@ -1,8 +1,11 @@
 from __future__ import annotations
-from typing import List, Literal, Optional, Tuple
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Literal, Optional, Tuple
 from pydantic import BaseModel, Field
 import unicodedata
 import datetime as dt
+import os
+import threading
 
 from app.fetchers.per_diem._types import (
     COUNTRY_TO_CURRENCY,
@@ -11,9 +14,10 @@ from app.fetchers.per_diem._types import (
     USStateCode,
     country_name_to_code_enum,
 )
-from app.fetchers.per_diem.scrapers.dssr import PerDiemRow, fetch_dos_per_diem
+from app.fetchers.per_diem.dssr_store import DssrSnapshotStats, dssr_store, ensure_country
+from app.fetchers.per_diem.scrapers.dssr import PerDiemRow
 from app.fetchers.per_diem.scrapers.exchange_rate import Currency, convert_to_currency
-from app.fetchers.per_diem.scrapers.gsa import fetch_gsa_data
+from app.fetchers.per_diem.gsa_store import GsaRateStoreStats, gsa_rate_store
 
 # ---------- Models ----------
 
@@ -88,8 +92,23 @@ class StayCostModel(BaseModel):
     local_amount: float
 
 
+class PerDiemLookupStats(BaseModel):
+    stays: int
+    # Distinct (location, meal deduction, domestic) stipends actually computed
+    computed_stays: int
+    # GSA, DSSR and exchange rate lookups made, and those answered from earlier in the request
+    upstream_calls: int
+    upstream_calls_saved: int
+
+
 class PerDiemResponse(BaseModel):
     costs: list[StayCostModel]
+    lookups: Optional[PerDiemLookupStats] = None
+
+
+class PerDiemStatsModel(BaseModel):
+    gsa_rate_store: GsaRateStoreStats
+    dssr_snapshot: DssrSnapshotStats
 
 
 # ---------- Constants ----------
@@ -101,6 +120,11 @@ INTERNATIONAL_DAILY_RATE = 80.0
 DOMESTIC_DAILY_RATE = 40.0
 RUSSIA_CIS_INTL_RATE = 40.0
 
+# GSA, DSSR and exchange rate lookups in flight at once across all per diem requests
+PER_DIEM_FETCH_CONCURRENCY = int(os.getenv("PER_DIEM_FETCH_CONCURRENCY", "8"))
+
+per_diem_executor = ThreadPoolExecutor(max_workers=PER_DIEM_FETCH_CONCURRENCY, thread_name_prefix="per-diem-fetch")
+
 
 def _norm(s: str) -> str:
     return (
@@ -112,20 +136,100 @@ def _norm(s: str) -> str:
     )
 
 
-def _dssr_foreign_per_diem(country: CountryCode, city: str) -> PerDiemRow:
-    rows = fetch_dos_per_diem(country)
-    city_norm = _norm(city)
-    row_index = -1
-    other_index = -1
-    for i, r in enumerate(rows):
-        post = _norm(r.post_name)
-        if post == city_norm:
-            row_index = i
-            break
-        if r.post_name == "Other":
-            other_index = i
+def _dssr_foreign_per_diem(country: CountryCode, city: str, when: Optional[dt.date] = None) -> PerDiemRow:
+    """
+    The DSSR row for `city` (or the country's "Other" row) from the local snapshot. A
+    country the refresh job hasn't ingested yet is scraped once and stored.
+    """
+    ensure_country(country)
+    row = dssr_store.lookup(country, city, when)
+    if row is None:
+        raise ValueError(f"No DSSR rates for {country.name}")
+    return row
+
+
+class StipendLookups:
+    """
+    Request-scoped memo for the upstream lookups behind stipend calculations, so stays
+    that revisit a city, or repeat within a group request, share GSA, DSSR and exchange
+    rate lookups instead of repeating them. Lookups can be prefetched concurrently on an
+    executor; a stay that needs one still in flight waits for it.
+    """
 
-    return rows[row_index if row_index != -1 else other_index]
+    def __init__(self, executor: Optional[Executor] = None):
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._memo: dict[tuple, Future] = {}
+        # Prefetched lookups no stay has read yet; their first read isn't a saved call
+        self._unread: set[tuple] = set()
+        self.calls = 0
+        self.saved = 0
+
+    def _future(self, key: tuple, compute: Callable[[], Any], prefetch: bool = False) -> Future:
+        with self._lock:
+            future = self._memo.get(key)
+            if future is not None:
+                if not prefetch:
+                    if key in self._unread:
+                        self._unread.discard(key)
+                    else:
+                        self.saved += 1
+                return future
+            self.calls += 1
+            if prefetch and self._executor is not None:
+                self._unread.add(key)
+                future = self._memo[key] = self._executor.submit(compute)
+                return future
+            future = self._memo[key] = Future()
+        try:
+            future.set_result(compute())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _get(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        return self._future(key, compute).result()
+
+    def _gsa_lookup(self, city: str, state: USStateCode, when: dt.date) -> tuple[tuple, Callable[[], Any]]:
+        return ("gsa", _norm(city), state, when), lambda: gsa_rate_store.lookup(city, state, when)
+
+    def _dssr_lookup(self, country: CountryCode, city: str) -> tuple[tuple, Callable[[], Any]]:
+        return ("dssr", country, _norm(city)), lambda: _dssr_foreign_per_diem(country, city)
+
+    def _fx_lookup(self, from_currency: Currency, to_currency: Currency) -> tuple[tuple, Callable[[], Any]]:
+        return ("fx", from_currency, to_currency), lambda: convert_to_currency(1.0, from_currency, to_currency)
+
+    def gsa(self, city: str, state: USStateCode, when: dt.date) -> tuple[int, int]:
+        return self._get(*self._gsa_lookup(city, state, when))
+
+    def dssr(self, country: CountryCode, city: str) -> PerDiemRow:
+        return self._get(*self._dssr_lookup(country, city))
+
+    def convert(self, amount: float, from_currency: Currency, to_currency: Currency) -> float:
+        # convert_to_currency is linear in amount, so one rate serves every amount
+        return self._get(*self._fx_lookup(from_currency, to_currency)) * amount
+
+    def prefetch(self, loc: USLocation | ForeignLocation, is_domestic: bool = False) -> None:
+        """
+        Start the lookups a stay at `loc` is likely to need. Over-fetching is harmless;
+        anything missed is looked up when the stay is computed.
+        """
+        if loc.kind == "us":
+            self._future(*self._gsa_lookup(loc.city, loc.state, dt.date.today()), prefetch=True)
+            return
+        country_code = country_name_to_code_enum(loc.country)
+        if country_code == CountryCode.ETHIOPIA:
+            self._future(*self._fx_lookup(Currency.US_DOLLAR, Currency.ETHIOPIAN_BIRR), prefetch=True)
+            return
+        # Domestic trips use the flat domestic rate and read DSSR only for the lodging of tiered countries
+        if not is_domestic or country_code in (CountryCode.CAMEROON, CountryCode.PHILIPPINES):
+            self._future(*self._dssr_lookup(country_code, loc.city), prefetch=True)
+        # Every foreign stay converts its USD amounts to the local currency
+        self._future(*self._fx_lookup(Currency.US_DOLLAR, COUNTRY_TO_CURRENCY.get(country_code, Currency.US_DOLLAR)), prefetch=True)
+        if country_code == CountryCode.CAMEROON:
+            self._future(*self._fx_lookup(Currency.CENTRAL_AFRICAN_CFA, Currency.US_DOLLAR), prefetch=True)
+        elif country_code == CountryCode.PHILIPPINES:
+            self._future(*self._fx_lookup(Currency.PHILIPPINE_PESO, Currency.US_DOLLAR), prefetch=True)
 
 
 def _philippines_tier_php(city: str) -> Tuple[int, str]:
@@ -175,7 +279,8 @@ def _calculate_travel_days_total(daily_rate: float, stay: StayModel) -> float:
 def _daily_stipend_usd_and_local(
     loc: USLocation | ForeignLocation,
     meal_deductions: bool,
-    is_domestic: bool = False
+    is_domestic: bool = False,
+    lookups: Optional[StipendLookups] = None,
 ) -> Tuple[float, str, float, float, float]:
     """
 
@@ -187,9 +292,11 @@ def _daily_stipend_usd_and_local(
 
     """
 
+    lookups = lookups or StipendLookups()
+
     # United States: GSA M&IE with $80/day cap
     if loc.kind == "us":
-        mie, lodging = fetch_gsa_data(loc.city, loc.state, dt.date.today())
+        mie, lodging = lookups.gsa(loc.city, loc.state, dt.date.today())
         daily = min(mie, US_DAILY_CAP)
 
         if meal_deductions:
@@ -205,32 +312,32 @@ def _daily_stipend_usd_and_local(
     
     # Specific country rates
     if country_code == CountryCode.CAMEROON:
-        cost_usd = convert_to_currency(40000.0, Currency.CENTRAL_AFRICAN_CFA, Currency.US_DOLLAR)
+        cost_usd = lookups.convert(40000.0, Currency.CENTRAL_AFRICAN_CFA, Currency.US_DOLLAR)
         local_currency = Currency.CENTRAL_AFRICAN_CFA.value
 
     elif country_code == CountryCode.ETHIOPIA:
         cost_usd = ETHIOPIA_FLAT
         local_currency = Currency.ETHIOPIAN_BIRR.value
         # Ethiopia: $25 flat rate with NO meal deductions per contract
-        cost_local_currency = convert_to_currency(cost_usd, Currency.US_DOLLAR, Currency.ETHIOPIAN_BIRR)
+        cost_local_currency = lookups.convert(cost_usd, Currency.US_DOLLAR, Currency.ETHIOPIAN_BIRR)
         return cost_usd, local_currency, cost_local_currency, 0.0, 0.0
     
     elif country_code == CountryCode.PHILIPPINES:
         php, code = _philippines_tier_php(loc.city)
-        cost_usd = convert_to_currency(php, Currency.PHILIPPINE_PESO, Currency.US_DOLLAR)
+        cost_usd = lookups.convert(php, Currency.PHILIPPINE_PESO, Currency.US_DOLLAR)
         local_currency = code
         # Philippines uses Double Payment Policy (EO 77) - handle separately
         if meal_deductions:
             # EO 77 deductions are applied in local currency (PHP) then converted
             deducted_php = php * 0.2  # 80% total deduction per contract
-            cost_usd = convert_to_currency(deducted_php, Currency.PHILIPPINE_PESO, Currency.US_DOLLAR)
+            cost_usd = lookups.convert(deducted_php, Currency.PHILIPPINE_PESO, Currency.US_DOLLAR)
 
     elif is_domestic:
         cost_usd = DOMESTIC_DAILY_RATE
 
     elif country_code in dssr_countries:
         # Use DSSR M&IE rates for Kenya, Tanzania, Nigeria, Malaysia, Vietnam
-        row = _dssr_foreign_per_diem(country_code, loc.city)
+        row = lookups.dssr(country_code, loc.city)
         cost_usd = row.mie_rate
         lodging_usd = row.max_lodging_rate
     elif country_code in meal_deduction_special_cases:
@@ -241,12 +348,12 @@ def _daily_stipend_usd_and_local(
     # Get DSSR lodging for non-travel-category rates (if not already set)
     if lodging_usd == 0 and cost_usd not in [DOMESTIC_DAILY_RATE, RUSSIA_CIS_INTL_RATE, INTERNATIONAL_DAILY_RATE]:
         if country_code not in dssr_countries:  # Don't double-fetch for DSSR countries
-            row = _dssr_foreign_per_diem(country_code, loc.city)
+            row = lookups.dssr(country_code, loc.city)
             lodging_usd = row.max_lodging_rate
     
     # Validate rates don't exceed DSSR/GSA maximums per contract
     if country_code not in [CountryCode.CAMEROON, CountryCode.ETHIOPIA, CountryCode.PHILIPPINES] and not is_domestic:
-        row = _dssr_foreign_per_diem(country_code, loc.city)
+        row = lookups.dssr(country_code, loc.city)
         if cost_usd > row.mie_rate:
             cost_usd = row.mie_rate  # Cap at DSSR maximum
     
@@ -258,10 +365,10 @@ def _daily_stipend_usd_and_local(
             cost_usd = cost_usd * 0.2  # 20% remaining after 80% deduction
     
     # Calculate local currency amounts
-    cost_local_currency = convert_to_currency(
+    cost_local_currency = lookups.convert(
         cost_usd, Currency.US_DOLLAR, COUNTRY_TO_CURRENCY.get(country_code, Currency.US_DOLLAR)
     )
-    lodging_local_currency = convert_to_currency(
+    lodging_local_currency = lookups.convert(
         lodging_usd, Currency.US_DOLLAR, COUNTRY_TO_CURRENCY.get(country_code, Currency.US_DOLLAR)
     )
     
@@ -271,14 +378,34 @@ def _daily_stipend_usd_and_local(
 # ---------- Public entrypoint ----------
 
 
+def get_per_diem_stats() -> PerDiemStatsModel:
+    return PerDiemStatsModel(
+        gsa_rate_store=gsa_rate_store.stats(),
+        dssr_snapshot=dssr_store.stats(),
+    )
+
+
 def get_per_diem_estimate(request: PerDiemRequest) -> PerDiemResponse:
     costs: List[StayCostModel] = []
     is_domestic = _is_domestic_travel(request)
-    
+    lookups = StipendLookups(per_diem_executor)
+    # Start every stay's upstream lookups at once; the loop below then mostly reads finished results
     for stay in request.stays:
-        daily_mie, local_code, mie_local, daily_lodging, lodging_local = (
-            _daily_stipend_usd_and_local(stay.location, stay.deduct_meals, is_domestic)
-        )
+        lookups.prefetch(stay.location, is_domestic)
+    # Stipend per identical (location, meal deduction) stay, with the lookups computing it took
+    stipends: dict[tuple, tuple[Tuple[float, str, float, float, float], int]] = {}
+
+    for stay in request.stays:
+        loc = stay.location
+        key = (loc.kind, loc.country, loc.state, _norm(loc.city), stay.deduct_meals)
+        if key in stipends:
+            stipend, lookup_count = stipends[key]
+            lookups.saved += lookup_count
+        else:
+            before = lookups.calls + lookups.saved
+            stipend = _daily_stipend_usd_and_local(loc, stay.deduct_meals, is_domestic, lookups)
+            stipends[key] = stipend, lookups.calls + lookups.saved - before
+        daily_mie, local_code, mie_local, daily_lodging, lodging_local = stipend
 
         # Calculate totals with 75% travel day rates
         total_meal_cost = _calculate_travel_days_total(daily_mie, stay)
@@ -302,4 +429,12 @@ def get_per_diem_estimate(request: PerDiemRequest) -> PerDiemResponse:
                 local_amount=local_total,
             )
         )
-    return PerDiemResponse(costs=costs)
+    return PerDiemResponse(
+        costs=costs,
+        lookups=PerDiemLookupStats(
+            stays=len(request.stays),
+            computed_stays=len(stipends),
+            upstream_calls=lookups.calls,
+            upstream_calls_saved=lookups.saved,
+        ),
+    )
@@ -0,0 +1,271 @@
+"""
+In-memory GSA per diem rates. Each state's full rate list for a year is pulled once,
+indexed by destination and county, and refreshed in the background, so US stays
+don't wait on api.gsa.gov per lookup.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Literal, Optional
+from pydantic import BaseModel
+from rapidfuzz import fuzz, process
+import datetime as dt
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from app.fetchers.per_diem._types import USStateCode
+from app.fetchers.per_diem.scrapers.gsa import RateDetail, fetch_gsa_data, fetch_gsa_state_rates, fetch_gsa_zip_rate
+
+# Hours before a state's rates are pulled again; 0 disables the background refresh
+GSA_REFRESH_HOURS = float(os.getenv("GSA_REFRESH_HOURS", "24"))
+
+# Seconds a state whose table failed to load is served by per-city calls before it is tried again
+GSA_RETRY_AFTER_S = 300
+
+# Plain edit-distance ratio, stricter than the flight city matcher: a wrong match silently applies another area's rate
+LOCALITY_MATCH_THRESHOLD = 90
+
+
+class GsaRateStoreStats(BaseModel):
+    tables: int
+    areas: int
+    hits: int
+    # Resolved localities by how they matched: city, county, zip or fuzzy
+    matches: dict[str, int]
+    # Lookups for cities outside every listed area, answered by GSA's per-city endpoint
+    # (usually with the standard rate, which the state lists leave out)
+    city_fallbacks: int
+    refresh_failures: int
+
+
+def _norm(name: str) -> str:
+    name = (
+        unicodedata.normalize("NFKD", name or "")
+        .encode("ascii", "ignore")
+        .decode()
+        .lower()
+    )
+    name = re.sub(r"[.,']", "", name).replace("saint ", "st ")
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _month_value(rate: RateDetail, month: int) -> int:
+    for m in rate.months.month:
+        if m.number == month:
+            return m.value
+    return rate.months.month[month - 1].value
+
+
+@dataclass
+class GsaLocality:
+    match: Literal["city", "county", "fuzzy"]
+    rate: RateDetail
+
+
+def _zip_code(key: str) -> Optional[str]:
+    """The five-digit ZIP code a normalized locality spells, as "02139" or "02139-4307"."""
+    found = re.fullmatch(r"(\d{5})(-\d{4})?", key)
+    return found.group(1) if found else None
+
+
+class GsaLocalityIndex:
+    """
+    One state's GSA non-standard rate areas for a year, indexed by primary destination
+    and county. A name matching neither is fuzzy-matched against destinations and
+    counties; anything else is only known to GSA's per-city endpoint, which answers
+    with the standard rate outside every area. Resolutions are remembered, so each
+    spelling is matched once.
+    """
+
+    def __init__(self, rates: list[RateDetail]):
+        self.fetched_at = time.time()
+        self.cities: dict[str, RateDetail] = {}
+        self.counties: dict[str, RateDetail] = {}
+        # Multi-city areas are listed as "Boston / Cambridge"
+        for rate in rates:
+            for city in rate.city.split("/"):
+                self.cities.setdefault(_norm(city), rate)
+        for rate in rates:
+            for county in rate.county.split("/"):
+                self.counties.setdefault(_norm(county).removesuffix(" county"), rate)
+        self._names = list(self.cities) + [name for name in self.counties if name not in self.cities]
+        self._lock = threading.Lock()
+        self._resolved: dict[str, Optional[GsaLocality]] = {}
+        # (meals, lodging per month) for cities GSA answered through its per-city endpoint
+        self.city_rates: dict[str, tuple[int, list[int]]] = {}
+
+    def _match(self, key: str) -> Optional[GsaLocality]:
+        if key in self.cities:
+            return GsaLocality("city", self.cities[key])
+        county = key.removesuffix(" county")
+        if county in self.counties:
+            return GsaLocality("county", self.counties[county])
+        match = process.extractOne(key, self._names, scorer=fuzz.ratio, score_cutoff=LOCALITY_MATCH_THRESHOLD)
+        if match is not None:
+            return GsaLocality("fuzzy", self.cities.get(match[0]) or self.counties[match[0]])
+        return None
+
+    def resolve(self, city: str) -> Optional[GsaLocality]:
+        """The locality `city` (a name or county) falls in; None when only GSA's per-city endpoint can tell."""
+        key = _norm(city)
+        with self._lock:
+            if key in self._resolved:
+                return self._resolved[key]
+        locality = self._match(key)
+        with self._lock:
+            self._resolved[key] = locality
+        return locality
+
+
+class GsaRateStore:
+    """
+    GSA rate tables per (state, year), loaded on first use with one call per table.
+    Concurrent lookups for a table still loading wait for that one call. A failed
+    refresh keeps the previous table. ZIP codes, which the tables don't carry, are
+    answered by GSA's ZIP endpoint once per (ZIP, year).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: dict[tuple[USStateCode, int], GsaLocalityIndex] = {}
+        self._loading: dict[tuple[USStateCode, int], threading.Lock] = {}
+        self._failed_at: dict[tuple[USStateCode, int], float] = {}
+        self._zip_rates: dict[tuple[str, int], RateDetail] = {}
+        self.hits = 0
+        self.matches: dict[str, int] = {}
+        self.city_fallbacks = 0
+        self.refresh_failures = 0
+
+    def _load(self, state: USStateCode, year: int) -> Optional[GsaLocalityIndex]:
+        key = (state, year)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                return table
+            if time.time() - self._failed_at.get(key, 0.0) < GSA_RETRY_AFTER_S:
+                return None
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None and time.time() - self._failed_at.get(key, 0.0) < GSA_RETRY_AFTER_S:
+                    return None
+            if table is not None:
+                return table
+            try:
+                table = GsaLocalityIndex(fetch_gsa_state_rates(state, year))
+            except Exception as e:
+                logging.warning(f"GSA rates for {state.value} {year} unavailable: {e}")
+                with self._lock:
+                    self.refresh_failures += 1
+                    self._failed_at[key] = time.time()
+                return None
+            with self._lock:
+                self._tables[key] = table
+                self._failed_at.pop(key, None)
+            return table
+
+    def _lookup_zip(self, zip_code: str, when: dt.date) -> tuple[int, int]:
+        key = (zip_code, when.year)
+        with self._lock:
+            rate = self._zip_rates.get(key)
+        if rate is None:
+            try:
+                rate = fetch_gsa_zip_rate(zip_code, when.year)
+            except Exception as e:
+                logging.warning(f"GSA rate for ZIP {zip_code} unavailable: {e}")
+                return 0, 0
+            with self._lock:
+                self._zip_rates[key] = rate
+        with self._lock:
+            self.hits += 1
+            self.matches["zip"] = self.matches.get("zip", 0) + 1
+        return rate.meals, _month_value(rate, when.month)
+
+    def lookup(self, city: str, state: USStateCode, when: Optional[dt.date] = None) -> tuple[int, int]:
+        """(M&IE total, lodging for the month), like fetch_gsa_data, which still answers unlisted cities."""
+        when = when or dt.date.today()
+        zip_code = _zip_code(_norm(city))
+        if zip_code:
+            return self._lookup_zip(zip_code, when)
+
+        table = self._load(state, when.year)
+        if table is None:
+            return fetch_gsa_data(city, state, when)
+
+        locality = table.resolve(city)
+        if locality is not None:
+            with self._lock:
+                self.hits += 1
+                self.matches[locality.match] = self.matches.get(locality.match, 0) + 1
+            return locality.rate.meals, _month_value(locality.rate, when.month)
+
+        key = _norm(city)
+        cached = table.city_rates.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached[0], cached[1][when.month - 1]
+
+        # Outside every listed area, most likely the standard rate: ask once per city and month, and never cache a failure
+        with self._lock:
+            self.city_fallbacks += 1
+        meals, lodging = fetch_gsa_data(city, state, when)
+        if meals or lodging:
+            with self._lock:
+                _, months = table.city_rates.setdefault(key, (meals, [0] * 12))
+                months[when.month - 1] = lodging
+        return meals, lodging
+
+    def refresh(self, max_age_s: float = 0.0) -> int:
+        """Pull every loaded table older than `max_age_s` again. Returns how many were replaced."""
+        now = time.time()
+        with self._lock:
+            stale = [key for key, table in self._tables.items() if now - table.fetched_at >= max_age_s]
+        refreshed = 0
+        for state, year in stale:
+            try:
+                table = GsaLocalityIndex(fetch_gsa_state_rates(state, year))
+            except Exception as e:
+                logging.warning(f"GSA refresh failed for {state.value} {year}: {e}")
+                with self._lock:
+                    self.refresh_failures += 1
+                continue
+            with self._lock:
+                self._tables[(state, year)] = table
+            refreshed += 1
+        return refreshed
+
+    def stats(self) -> GsaRateStoreStats:
+        with self._lock:
+            return GsaRateStoreStats(
+                tables=len(self._tables),
+                areas=sum(len(table.cities) for table in self._tables.values()),
+                hits=self.hits,
+                matches=dict(self.matches),
+                city_fallbacks=self.city_fallbacks,
+                refresh_failures=self.refresh_failures,
+            )
+
+
+gsa_rate_store = GsaRateStore()
+
+
+def start_refresh_thread(interval_hours: float = GSA_REFRESH_HOURS) -> threading.Thread:
+    """Keep loaded GSA tables fresh in the background."""
+    def loop() -> None:
+        while True:
+            time.sleep(max(interval_hours * 3600 / 24, 60))
+            try:
+                refreshed = gsa_rate_store.refresh(max_age_s=interval_hours * 3600)
+                if refreshed:
+                    logging.info(f"Refreshed GSA rates for {refreshed} state-years")
+            except Exception as e:
+                logging.warning(f"GSA refresh failed: {e}")
+
+    thread = threading.Thread(target=loop, name="gsa-refresh", daemon=True)
+    thread.start()
+    return thread
@@ -150,9 +150,14 @@ def parse_per_diem_table(html: str) -> List[PerDiemRow]:
     return rows
 
 # --- Fetch + parse ---
-def fetch_dos_per_diem(country: CountryCode, post_query: str = "") -> List[PerDiemRow]:
-    s = requests.Session()
-    s.get(FORM_URL, timeout=15)  # prime cookies
+def fetch_dos_per_diem(
+    country: CountryCode, post_query: str = "", session: Optional[requests.Session] = None
+) -> List[PerDiemRow]:
+    """Pass a `session` whose cookies are already primed to skip the form page GET."""
+    s = session
+    if s is None:
+        s = requests.Session()
+        s.get(FORM_URL, timeout=15)  # prime cookies
     payload = {"CountryCode": country.value, "Post": post_query}
     res = s.post(ACTION_URL, data=payload, timeout=20)
     res.raise_for_status()
@@ -48,6 +48,37 @@ API_KEY = os.getenv("GSA_API_KEY")
 if not API_KEY:
     raise ValueError("GSA_API_KEY environment variable is not set")
 
+BASE_URL = "https://api.gsa.gov/travel/perdiem/v2/rates"
+
+# One keep-alive connection pool for every GSA call
+session = requests.Session()
+
+
+def fetch_gsa_state_rates(state: USStateCode, year: int) -> List[RateDetail]:
+    """
+    Every non-standard rate area GSA lists for a state and year, in one call. The
+    standard rate is not part of it, and neither are ZIP codes (`zip` is left empty).
+    Raises on transport or validation errors so callers can keep what they had.
+    """
+    r = session.get(f"{BASE_URL}/state/{state.value}/year/{year}?api_key={API_KEY}", timeout=20)
+    r.raise_for_status()
+    validated_data = GsaModel.model_validate(r.json())
+    return [rate for entry in validated_data.rates for rate in entry.rate]
+
+
+def fetch_gsa_zip_rate(zip_code: str, year: int) -> RateDetail:
+    """
+    The rate for a five-digit ZIP code and year: its non-standard area's, or the standard
+    rate. Raises on transport or validation errors, or when GSA has no rate for the ZIP.
+    """
+    r = session.get(f"{BASE_URL}/zip/{zip_code}/year/{year}?api_key={API_KEY}", timeout=10)
+    r.raise_for_status()
+    validated_data = GsaModel.model_validate(r.json())
+    if not validated_data.rates or not validated_data.rates[0].rate:
+        raise ValueError(f"No rate found for ZIP {zip_code}")
+    return validated_data.rates[0].rate[0]
+
+
 def fetch_gsa_data(city: Optional[str], state: USStateCode, when: Optional[dt.date] = None) -> tuple[int, int]:
     """
     Fetch US M&IE via GSA API; Returns, (M&IE total, lodging)
@@ -56,10 +87,10 @@ def fetch_gsa_data(city: Optional[str], state: USStateCode, when: Optional[dt.da
 
     when = when or dt.date.today()
     year, month = when.year, when.month
-    url = f"https://api.gsa.gov/travel/perdiem/v2/rates/city/{city}/state/{state.value}/year/{year}?api_key={API_KEY}"
+    url = f"{BASE_URL}/city/{city}/state/{state.value}/year/{year}?api_key={API_KEY}"
 
     try:
-        r = requests.get(url, timeout=10)
+        r = session.get(url, timeout=10)
         r.raise_for_status()
         data = r.json()
 
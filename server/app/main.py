@@ -1,9 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routers import estimates
 from fastapi.middleware.cors import CORSMiddleware
 from app.middleware import api_key_middleware
+from app.fetchers.flights.flights import parse_pool, prewarm_airport_codes
+from app.fetchers.per_diem import dssr_store, gsa_store
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prewarm_airport_codes()
+    if dssr_store.DSSR_REFRESH_HOURS > 0:
+        dssr_store.start_refresh_thread()
+    if gsa_store.GSA_REFRESH_HOURS > 0:
+        gsa_store.start_refresh_thread()
+    yield
+    if parse_pool is not None:
+        parse_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.fetchers.flights.flights import FlightRequest, fetch_flights
-from app.fetchers.per_diem.fetcher import PerDiemRequest, get_per_diem_estimate
+import json
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.fetchers.flights.flights import FlightRequest, fetch_flights, get_flight_stats, stream_flights
+from app.fetchers.flights.attendee_matrix import AttendeeMatrixRequest, fetch_attendee_matrix
+from app.fetchers.flights.fare_calendar import FareCalendarRequest, fetch_fare_calendar
+from app.fetchers.per_diem.fetcher import PerDiemRequest, get_per_diem_estimate, get_per_diem_stats
 from app.fetchers.translations._types import TranslationRequest
 from app.fetchers.translations.fetcher import fetch_translations, load_historical_data
 from app.fetchers.catering import CateringRequest, get_catering_estimate
@@ -13,17 +17,49 @@ from app.fetchers.ground_transport import GroundTransportRequest, get_ground_tra
 router = APIRouter()
 
 
+# Flight routes are plain def so FastAPI runs their blocking searches in its threadpool,
+# letting concurrent requests share the search scheduler instead of queueing on the event loop
 @router.post("/flights")
-async def find_estimates(req: FlightRequest):
+def find_estimates(req: FlightRequest):
     return fetch_flights(
         req
     )
 
+@router.post("/flights/stream")
+async def stream_estimates(req: FlightRequest, request: Request):
+    # Newline-delimited JSON by default, server-sent events when the client asks for them
+    if "text/event-stream" in request.headers.get("accept", ""):
+        frames = (f"event: {frame['event']}\ndata: {json.dumps(frame)}\n\n" for frame in stream_flights(req))
+        return StreamingResponse(frames, media_type="text/event-stream")
+
+    frames = (json.dumps(frame) + "\n" for frame in stream_flights(req))
+    return StreamingResponse(frames, media_type="application/x-ndjson")
+
+@router.post("/flights/calendar")
+def fare_calendar(req: FareCalendarRequest):
+    return fetch_fare_calendar(
+        req
+    )
+
+@router.post("/flights/attendees")
+def attendee_matrix(req: AttendeeMatrixRequest):
+    return fetch_attendee_matrix(
+        req
+    )
+
+@router.get("/flights/stats")
+async def flight_stats():
+    return get_flight_stats()
+
 @router.post("/per-diem")
 async def find_meal_and_lodging(req: PerDiemRequest):
     return get_per_diem_estimate(
         req
     )
+
+@router.get("/per-diem/stats")
+async def per_diem_stats():
+    return get_per_diem_stats()
  
 @router.post("/translations")
 async def translate_texts(req: TranslationRequest):
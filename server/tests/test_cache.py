@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import time
+
+import pytest
+
+from app.fetchers.flights import cache
+from app.fetchers.flights.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock, time=time.time))
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    c = TTLCache(maxsize=4, ttl=10)
+    c.set("a", 1)
+    clock.now += 10
+    assert c.get("a") == 1
+    clock.now += 0.1
+    assert c.get("a") is None
+    assert len(c) == 0
+    stats = c.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (1, 1, 1)
+
+
+def test_age_backdates_an_entry(clock):
+    c = TTLCache(maxsize=4, ttl=10)
+    c.set("a", 1, age=8)
+    clock.now += 3
+    assert c.get("a") is None
+
+
+def test_least_recently_used_is_evicted(clock):
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "b" is now the least recently used
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert (c.get("a"), c.get("c")) == (1, 3)
+    assert c.stats().evictions == 1
+
+
+def test_get_or_compute_computes_once(clock):
+    c = TTLCache(maxsize=2, ttl=10)
+    calls = []
+    compute = lambda: calls.append(1) or "value"
+    assert c.get_or_compute("k", compute) == "value"
+    assert c.get_or_compute("k", compute) == "value"
+    assert len(calls) == 1
+    clock.now += 11
+    assert c.get_or_compute("k", compute) == "value"
+    assert len(calls) == 2
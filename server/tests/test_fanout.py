@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from app.fetchers.flights.fanout import StopRule, collect
+
+
+def test_stop_rule_min_options():
+    rule = StopRule(min_options=3)
+    assert not rule.update(1, 100.0)
+    assert not rule.update(2, 90.0)
+    assert rule.update(3, 90.0)
+
+
+def test_stop_rule_stable_after():
+    rule = StopRule(stable_after=2)
+    assert not rule.update(1, 100.0)
+    assert not rule.update(2, 100.0)
+    assert rule.update(3, 100.0)
+    # A cheaper price restarts the count
+    assert not rule.update(4, 80.0)
+
+
+def test_stop_rule_without_prices_or_settings_never_stops():
+    assert not any(StopRule(stable_after=1).update(0, None) for _ in range(5))
+    assert not any(StopRule().update(n, 50.0) for n in range(5))
+
+
+def test_collect_handles_every_future_without_a_stop():
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(lambda i=i: i) for i in range(6)]
+        seen = []
+        reason, skipped = collect(futures, lambda future: seen.append(future.result()) or False)
+    assert reason is None and skipped == []
+    assert sorted(seen) == list(range(6))
+
+
+def test_collect_stops_once_handle_is_satisfied():
+    release = threading.Event()
+    with ThreadPoolExecutor(2) as pool:
+        quick = [pool.submit(lambda: 1) for _ in range(2)]
+        slow = [pool.submit(release.wait, 5) for _ in range(4)]
+        rule = StopRule(min_options=2)
+        count = []
+
+        def handle(future):
+            count.append(future.result())
+            return rule.update(len(count), None)
+
+        reason, skipped = collect(quick + slow, handle)
+        release.set()
+    assert reason == "enough_results"
+    assert set(skipped) == set(slow)
+
+
+def test_collect_deadline_skips_and_cancels_unfinished_futures():
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as pool:
+        done = pool.submit(lambda: "fast")
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(lambda: "never")
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        reason, skipped = collect([done, running, queued], lambda future: False, deadline=time.monotonic() + 0.1)
+        elapsed = time.monotonic() - started
+        release.set()
+    assert reason == "deadline"
+    assert skipped == [running, queued]
+    assert queued.cancelled()
+    assert elapsed < 1.0
+
+
+def test_collect_past_deadline_returns_at_once():
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as pool:
+        future = pool.submit(release.wait, 5)
+        reason, skipped = collect([future], lambda f: False, deadline=time.monotonic() - 1)
+        release.set()
+    assert reason == "deadline" and skipped == [future]
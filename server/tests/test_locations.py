@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from app.fetchers.flights.locations import CityResolver
+
+
+@pytest.fixture
+def resolver() -> CityResolver:
+    cities = ["Pyongyang", "Seoul", "Busan", "Kinshasa", "Brazzaville"]
+    countries = ["North Korea", "South Korea", "South Korea", "Congo (Kinshasa)", "Congo (Brazzaville)"]
+    iso2s = ["KP", "KR", "KR", "CD", "CG"]
+    lats = np.array([39.02, 37.57, 35.10, -4.32, -4.27], dtype=np.float32)
+    lngs = np.array([125.75, 126.98, 129.04, 15.31, 15.28], dtype=np.float32)
+    return CityResolver(cities, countries, iso2s, lats, lngs, {"Korea, North": "KP", "Korea, South": "KR"})
+
+
+def test_ambiguous_country_resolves_city_in_either(resolver):
+    assert resolver.resolve("korea", "seoul").iso2 == "KR"
+    assert resolver.resolve("korea", "pyongyang").iso2 == "KP"
+    assert resolver.resolve("korea", "busn").city == "Busan"
+
+
+def test_ambiguous_country_lists_every_candidate(resolver):
+    assert set(resolver.country_candidates("korea")) == {"KP", "KR"}
+    assert set(resolver.country_candidates("congo")) == {"CD", "CG"}
+
+
+def test_exact_country_is_tried_first(resolver):
+    assert resolver.country_candidates("south korea")[0] == "KR"
+    assert resolver.resolve("South Korea", "Seoul").iso2 == "KR"
+
+
+def test_unknown_names_raise(resolver):
+    with pytest.raises(ValueError, match="Country not found"):
+        resolver.resolve("atlantis", "seoul")
+    with pytest.raises(ValueError, match="City not found"):
+        resolver.resolve("korea", "tokyo")
@@ -0,0 +1,51 @@
+import itertools
+import random
+
+import pytest
+
+from app.fetchers.flights.pairing import k_smallest_pairs
+
+
+def brute_force(left, right, k, accept=None):
+    pairs = [
+        (lp + rp, a, b)
+        for (lp, a), (rp, b) in itertools.product(left, right)
+        if accept is None or accept(a, b)
+    ]
+    return sorted(pairs, key=lambda pair: pair[0])[:k]
+
+
+def sides(rng: random.Random):
+    left = sorted((float(rng.randint(50, 500)), f"out{i}") for i in range(rng.randint(0, 12)))
+    right = sorted((float(rng.randint(50, 500)), f"ret{i}") for i in range(rng.randint(0, 12)))
+    return left, right
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    left, right = sides(rng)
+    k = rng.randint(0, 30)
+    # Ties may come out in any order, so compare the sums and the set of pairs per sum
+    got = k_smallest_pairs(left, right, k)
+    want = brute_force(left, right, k)
+    assert [total for total, _, _ in got] == [total for total, _, _ in want]
+    assert len(set((a, b) for _, a, b in got)) == len(got)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_rejected_pairs_are_skipped(seed):
+    rng = random.Random(seed)
+    left, right = sides(rng)
+    k = rng.randint(1, 30)
+    accept = lambda a, b: (int(a[3:]) + int(b[3:])) % 3 != 0
+    got = k_smallest_pairs(left, right, k, accept)
+    want = brute_force(left, right, k, accept)
+    assert [total for total, _, _ in got] == [total for total, _, _ in want]
+    assert all(accept(a, b) for _, a, b in got)
+
+
+def test_empty_sides_and_k():
+    assert k_smallest_pairs([], [(1.0, "b")], 3) == []
+    assert k_smallest_pairs([(1.0, "a")], [], 3) == []
+    assert k_smallest_pairs([(1.0, "a")], [(1.0, "b")], 0) == []
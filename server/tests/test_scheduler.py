@@ -0,0 +1,87 @@
+import threading
+import time
+
+from app.fetchers.flights.scheduler import SearchScheduler
+
+
+class Probe:
+    """Task that records how many calls of its session run at once, until released."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.release = threading.Event()
+
+    def __call__(self, value):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self._lock:
+            self.running -= 1
+        return value
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+def test_per_session_limit_caps_in_flight_tasks():
+    scheduler = SearchScheduler(max_concurrency=8, per_session_limit=2, name="test-limit")
+    probe = Probe()
+    with scheduler.session() as session:
+        futures = [session.submit(probe, i) for i in range(6)]
+        wait_for(lambda: probe.running == 2)
+        time.sleep(0.05)
+        assert probe.running == 2
+        assert scheduler.stats().queue_depth == 4
+
+        probe.release.set()
+        assert [future.result(5) for future in futures] == list(range(6))
+    assert probe.peak == 2
+
+
+def test_other_sessions_run_while_one_is_at_its_limit():
+    scheduler = SearchScheduler(max_concurrency=4, per_session_limit=1, name="test-fair")
+    busy, quick = Probe(), Probe()
+    quick.release.set()
+    with scheduler.session() as first, scheduler.session() as second:
+        blocked = [first.submit(busy, i) for i in range(3)]
+        wait_for(lambda: busy.running == 1)
+        assert second.submit(quick, "done").result(5) == "done"
+        assert busy.running == 1
+
+        busy.release.set()
+        assert [future.result(5) for future in blocked] == [0, 1, 2]
+    assert busy.peak == 1
+
+
+def test_session_limit_overrides_scheduler_default():
+    scheduler = SearchScheduler(max_concurrency=8, per_session_limit=4, name="test-override")
+    probe = Probe()
+    with scheduler.session(max_in_flight=1) as session:
+        futures = [session.submit(probe, i) for i in range(3)]
+        wait_for(lambda: probe.running == 1)
+        time.sleep(0.05)
+        assert probe.running == 1
+        probe.release.set()
+        [future.result(5) for future in futures]
+    assert probe.peak == 1
+
+
+def test_closing_a_session_cancels_queued_tasks():
+    scheduler = SearchScheduler(max_concurrency=2, per_session_limit=1, name="test-close")
+    probe = Probe()
+    session = scheduler.session()
+    running = session.submit(probe, 0)
+    queued = [session.submit(probe, i) for i in range(1, 4)]
+    wait_for(lambda: probe.running == 1)
+    session.close()
+    assert all(future.cancelled() for future in queued)
+    probe.release.set()
+    assert running.result(5) == 0